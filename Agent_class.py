@@ -1,76 +1,191 @@
 import random
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from collections import deque
 from dqn import DQN
-from ReplayBuffer import ReplayBuffer
+from numpy_dqn import NumpyDQN
+from ReplayBuffer import ReplayBuffer, PrioritizedReplayBuffer
+from profiler import NULL_PROFILER
+from seeding import spawn_seeds, int_seed
 
 
 class Agent:
-    def __init__(self, input_dim, output_dim):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.policy = DQN(input_dim, output_dim).to(self.device)  # warstwa danych wejściowych
-        self.target = DQN(input_dim, output_dim).to(self.device)  # warstwa danych wyjściowych (Nic nie rób, albo skacz)
+    def __init__(self, input_dim, output_dim, prioritized=False, inference=None, alpha=0.0001, gamma=0.99,
+                 network_sync_rate=1000, replay_capacity=100000, batch_size=32, hidden_dim=512, epsilon=1.0,
+                 epsilon_min=0.01, epsilon_decay=0.9995, device=None, train_every=1, updates_per_train=1, tau=None,
+                 double=False, dueling=False, n_step=1, seed=None):
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.hidden_dim = hidden_dim
+        self.dueling = dueling
+        # seed - osobne strumienie dla wag początkowych, eksploracji, select_actions i bufora pamięci,
+        # ten sam seed daje ten sam przebieg, a globalny stan random/torch nie jest ani używany, ani zmieniany
+        init_seed, random_seed, np_seed, buffer_seed = spawn_seeds(seed, 4)
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(int_seed(init_seed))
+            self.policy = DQN(input_dim, output_dim, hidden_dim, dueling).to(self.device)  # warstwa danych wejściowych
+            # warstwa danych wyjściowych (Nic nie rób, albo skacz)
+            self.target = DQN(input_dim, output_dim, hidden_dim, dueling).to(self.device)
         self.target.load_state_dict(self.policy.state_dict())  # kopiujemy policy do target
 
-        self.alpha = 0.0001  # learning rate
-        self.gamma = 0.99  # discount rate
-        self.network_sync_rate = 1000  # liczba kroków, która jest potrzeba do synchronizacji target z policy
-        self.replay_buffer = ReplayBuffer(100000)  # inicjalizacja buffora pamięci
-        self.batch_size = 32  # wielkośc próbek jakie będziemy losowo wybierać z buffora pamięci do trenowania policy
+        self.alpha = alpha  # learning rate
+        self.gamma = gamma  # discount rate
+        # liczba kroków, która jest potrzeba do synchronizacji target z policy
+        self.network_sync_rate = network_sync_rate
+        # tau - miękka aktualizacja target (Polyak) po każdym kroku treningu zamiast kopiowania co network_sync_rate
+        self.tau = tau
+        # double - akcję w następnym stanie wybiera policy, a ocenia ją target (mniejsze przeszacowanie Q)
+        self.double = double
+        # n_step - bufor zapisuje sumę n zdyskontowanych nagród, wartość stanu po n krokach mnożymy przez gamma ** n
+        self.n_step = n_step
+        # inicjalizacja buffora pamięci, prioritized - bufor z priorytetami zależnymi od błędu TD
+        self.prioritized = prioritized
+        if self.prioritized:
+            self.replay_buffer = PrioritizedReplayBuffer(replay_capacity, input_dim, self.device, n_step=n_step,
+                                                         gamma=gamma, seed=buffer_seed)
+        else:
+            self.replay_buffer = ReplayBuffer(replay_capacity, input_dim, self.device, n_step, gamma, buffer_seed)
+        # wielkośc próbek jakie będziemy losowo wybierać z buffora pamięci do trenowania policy
+        self.batch_size = batch_size
         self.cost_function = nn.MSELoss()  # funkja do oceny rozbieżności między obecnym stanem policy a oczekiwanym
         self.optimizer = optim.Adam(self.policy.parameters(),
                                     lr=self.alpha)  # aktualizuje wagi i biasy sieci neuronowej
         # aby zmniejszyć obliczony cost, robi to na podstawie gradientów wyliczych w backward()
-        self.epsilon = 1.0  # wskaźnik eksploracji
-        self.epsilon_min = 0.01  # minimalna eksploracja
-        self.epsilon_decay = 0.9995  # spadek eksploracji
+        self.epsilon = epsilon  # wskaźnik eksploracji
+        self.epsilon_min = epsilon_min  # minimalna eksploracja
+        self.epsilon_decay = epsilon_decay  # spadek eksploracji
         self.train_step_counter = 0  # licznik kroków
+        # co train_every kroków gry wykonujemy updates_per_train kroków treningu,
+        # próbki dla całego bloku są losowane i przenoszone na urządzenie jednym wywołaniem
+        self.train_every = train_every
+        self.updates_per_train = updates_per_train
+        self.env_step_counter = 0  # licznik wywołań train(), czyli kroków gry
+
+        # sposób wyboru najlepszej akcji: "torch" - forward nn.Module, "numpy" - NumpyDQN
+        # domyślnie na CPU numpy, bo dla jednego stanu narzut torcha jest większy niż samo liczenie sieci
+        self.inference = inference or ("numpy" if self.device.type == "cpu" else "torch")
+        self.numpy_policy = None
+        self.numpy_policy_step = -1  # krok treningu, z którego pochodzą wagi numpy_policy
+        self.random = random.Random(int_seed(random_seed))  # losowanie eksploracji w select_action
+        self.np_random = np.random.default_rng(np_seed)  # losowanie eksploracji w select_actions
+        self.profiler = NULL_PROFILER  # pomiary czasu faz treningu (profiler.Profiler)
+        # suma kosztów wszystkich kroków treningu, trzymana jako tensor na urządzeniu, żeby nie czekać na GPU
+        # w każdym kroku - średni koszt za dowolny okres to różnica sum podzielona przez różnicę loss_count
+        self.loss_total = 0.0
+        self.loss_count = 0
 
     def select_action(self, state):
         # jeżeli losowa liczba jest mniejsza niż wskaźnik eksploracji
         # to wybieramy losową akcję
         # w przeciwnym wypadku wybieramy najlepszą akcję na podstawie policy
-        if random.random() < self.epsilon:
-            return 1 if random.random() < 1 / 20 else 0
+        if self.random.random() < self.epsilon:
+            return 1 if self.random.random() < 1 / 20 else 0
         else:
+            if self.inference == "numpy":
+                q_values = self.get_numpy_policy()(np.asarray(state, dtype=np.float32))
+                return int(q_values.argmax())
             state = torch.FloatTensor(state).unsqueeze(0).to(self.device)
             with torch.no_grad():
                 q_values = self.policy(state)
             return q_values.argmax().item()
 
+    def select_actions(self, states):
+        # wybór akcji dla wielu środowisk naraz (np. VecFlappyEnv), states ma kształt (n, input_dim)
+        # eksploracja losowana osobno dla każdego stanu, zwraca tablicę n akcji
+        states = np.asarray(states, dtype=np.float32)
+        n = len(states)
+        if self.inference == "numpy":
+            actions = self.get_numpy_policy()(states).argmax(axis=1)
+        else:
+            with torch.no_grad():
+                actions = self.policy(torch.from_numpy(states).to(self.device)).argmax(dim=1).cpu().numpy()
+        if self.epsilon > 0:
+            explore = self.np_random.random(n) < self.epsilon
+            random_actions = self.np_random.random(n) < 1 / 20
+            actions = np.where(explore, random_actions, actions)
+        return actions.astype(np.int64)
+
+    def get_numpy_policy(self):
+        # na CPU NumpyDQN trzyma widoki na wagi policy, więc wystarczy utworzyć go raz,
+        # na GPU wagi kopiujemy ponownie tylko gdy od ostatniego razu był krok treningu
+        if self.numpy_policy is None or (self.device.type != "cpu"
+                                         and self.numpy_policy_step != self.train_step_counter):
+            self.numpy_policy = NumpyDQN.from_module(self.policy)
+            self.numpy_policy_step = self.train_step_counter
+        return self.numpy_policy
+
     def train(self):
+        # wywoływane po każdym kroku gry
+        self.env_step_counter += 1
+        if self.env_step_counter % self.train_every == 0:
+            self.learn(self.updates_per_train)
+
+    def learn(self, updates=1):
         if len(self.replay_buffer) < self.batch_size:
             return  # nie trenujemy dopóki nie mamy wystarczającej liczby doświadczeń
 
         # pobieramy losowo wybrane dane dotyczących akcji i ich konsekwencji z bufora pamięci
-        states, actions, new_states, rewards, dones = self.replay_buffer.sample(self.batch_size)
+        # bufor zwraca od razu tensory na właściwym urządzeniu, jedna próbka na cały blok kroków treningu
+        start = self.profiler.time()
+        block = self.replay_buffer.sample(self.batch_size * updates)
+        self.profiler.add("train_sample", start)
 
-        states = torch.FloatTensor(states).to(self.device)
-        actions = torch.LongTensor(actions).unsqueeze(1).to(self.device)
-        new_states = torch.FloatTensor(new_states).to(self.device)
-        rewards = torch.FloatTensor(rewards).unsqueeze(1).to(self.device)
-        dones = torch.FloatTensor(dones).unsqueeze(1).to(self.device)
+        # co updates-ty element, bo bufor z priorytetami losuje warstwowo po kolejnych przedziałach sumy priorytetów,
+        # więc każdy krok treningu dostaje próbki z całego zakresu
+        for update in range(updates):
+            self.gradient_step(*(field[update::updates] for field in block))
 
+    def gradient_step(self, states, actions, new_states, rewards, dones, weights=None, indices=None):
         # obliczamy wartości dla neuronów wyjściowych reprezentujących wybrane akcje
-        q_values = self.policy(states).gather(1, actions)
+        start = self.profiler.time()
+        if self.double:
+            # jeden przebieg policy dla stanów i nowych stanów naraz, gradient płynie tylko przez część ze stanami
+            all_q_values = self.policy(torch.cat((states, new_states)))
+            q_values = all_q_values[:len(states)].gather(1, actions)
+            next_actions = all_q_values[len(states):].detach().argmax(1, keepdim=True)
+        else:
+            q_values = self.policy(states).gather(1, actions)
 
-        # obliczamy docelowe wartości q: reward + gamma * max(Q(next_state)) * (1 - done)
+        # obliczamy docelowe wartości q: reward + gamma^n * Q_target(next_state, a') * (1 - done),
+        # a' = argmax Q_policy(next_state) dla double, w przeciwnym razie argmax Q_target(next_state)
         with torch.no_grad():
-            next_q_values = self.target(new_states).max(1, keepdim=True)[0]
-            targets = rewards + self.gamma * next_q_values * (1 - dones)
+            next_q_values = self.target(new_states)
+            if self.double:
+                next_q_values = next_q_values.gather(1, next_actions)
+            else:
+                next_q_values = next_q_values.max(1, keepdim=True)[0]
+            targets = rewards + self.gamma ** self.n_step * next_q_values * (1 - dones)
 
         # obliczamy cost
-        cost = self.cost_function(q_values, targets)
+        if self.prioritized:
+            # błędy TD ważone wagami importance sampling, one też są nowymi priorytetami przejść
+            td_errors = targets - q_values
+            cost = (weights * td_errors ** 2).mean()
+            self.profiler.add("train_forward", start)
+            start = self.profiler.time()
+            self.replay_buffer.update_priorities(indices, td_errors.detach().squeeze(1).cpu().numpy())
+            self.profiler.add("train_priorities", start)
+        else:
+            cost = self.cost_function(q_values, targets)
+            self.profiler.add("train_forward", start)
 
         # aktualizacja wag i biasów na podstawie cost (propagacja wsteczna)
+        start = self.profiler.time()
         self.optimizer.zero_grad()
         cost.backward()
+        self.profiler.add("train_backward", start)
+        start = self.profiler.time()
         self.optimizer.step()
+        self.profiler.add("train_optimizer_step", start)
+        self.profiler.count("updates")
+        self.loss_total += cost.detach().double()
+        self.loss_count += 1
 
         self.train_step_counter += 1
-        if self.train_step_counter % self.network_sync_rate == 0:
+        if self.tau is not None:
+            self.soft_update_target()
+        elif self.train_step_counter % self.network_sync_rate == 0:
             self.update_target()
 
         # print(self.epsilon)
@@ -82,3 +197,9 @@ class Agent:
 
     def update_target(self):
         self.target.load_state_dict(self.policy.state_dict())
+
+    def soft_update_target(self):
+        # target = (1 - tau) * target + tau * policy
+        with torch.no_grad():
+            for target_param, param in zip(self.target.parameters(), self.policy.parameters()):
+                target_param.lerp_(param, self.tau)
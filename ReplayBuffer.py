@@ -1,19 +1,220 @@
-import random
+import operator
 from collections import deque
 
+import numpy as np
+import torch
+
 
 class ReplayBuffer:
-    def __init__(self, capacity):
-        self.buffer = deque(maxlen=capacity)
+    # bufor cykliczny o stałej pojemności, każde pole przejścia trzymane w osobnej, ciągłej tablicy NumPy
+    # po zapełnieniu nowe przejścia nadpisują najstarsze (tak jak deque z maxlen)
+    # n_step > 1 - push zapisuje przejścia n-krokowe: stan i akcja sprzed n kroków, nagroda to suma
+    # zdyskontowanych n nagród, a nowy stan to stan po n krokach (przy końcu gry krótsze, z done = 1)
+
+    def __init__(self, capacity, state_dim=4, device="cpu", n_step=1, gamma=0.99, seed=None):
+        self.capacity = capacity
+        self.n_step = n_step
+        self.gamma = gamma
+        self.pending = deque()  # ostatnie przejścia jednokrokowe, jeszcze niezapisane jako n-krokowe
+        self.device = torch.device(device)
+        self.random = np.random.default_rng(seed)  # seed - liczba albo np.random.SeedSequence
+
+        self.states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.actions = np.zeros((capacity, 1), dtype=np.int64)
+        self.next_states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.rewards = np.zeros((capacity, 1), dtype=np.float32)
+        self.dones = np.zeros((capacity, 1), dtype=np.float32)
+
+        self.position = 0  # indeks, pod który trafi następne przejście
+        self.size = 0
+        self.pushed = 0  # liczba wszystkich dodanych przejść, pozwala zapisywać bufor przyrostowo
 
     def push(self, transition):
-        # state, action, new_state, reward, done = transition
-        self.buffer.append(transition)
+        if self.n_step == 1:
+            self.store(*transition)
+            return
+        self.pending.append(transition)
+        if transition[4]:
+            # koniec gry: zapisujemy wszystkie oczekujące przejścia, każde z krótszą sumą nagród
+            while self.pending:
+                self.store(*self.n_step_transition())
+                self.pending.popleft()
+        elif len(self.pending) == self.n_step:
+            self.store(*self.n_step_transition())
+            self.pending.popleft()
+
+    def n_step_transition(self):
+        state, action = self.pending[0][:2]
+        _, _, new_state, _, done = self.pending[-1]
+        reward = 0.0
+        for transition in reversed(self.pending):
+            reward = transition[3] + self.gamma * reward
+        return state, action, new_state, reward, done
+
+    def end_episode(self):
+        # gra przerwana bez końca (np. limit kroków): nie łączymy jej przejść z następną grą
+        self.pending.clear()
+
+    def store(self, state, action, new_state, reward, done):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.next_states[i] = new_state
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.pushed += 1
+
+    def push_batch(self, states, actions, new_states, rewards, dones):
+        # dodanie wielu przejść naraz, np. z VecFlappyEnv - zapisywane bez zmian, jako gotowe przejścia
+        if self.n_step > 1:
+            raise ValueError("push_batch stores finished transitions, n-step returns need push()")
+        count = len(actions)
+        indices = (self.position + np.arange(count)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices, 0] = actions
+        self.next_states[indices] = new_states
+        self.rewards[indices, 0] = rewards
+        self.dones[indices, 0] = dones
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        self.pushed += count
 
     def sample(self, batch_size):
-        batch = random.sample(self.buffer, batch_size)
-        states, actions, next_states, rewards, dones = zip(*batch)
-        return states, actions, next_states, rewards, dones
+        # losowanie ze zwracaniem, zwraca gotowe tensory na urządzeniu agenta:
+        # stany (B, state_dim), akcje (B, 1), nowe stany (B, state_dim), nagrody (B, 1), końce (B, 1)
+        indices = self.random.integers(0, self.size, batch_size)
+        return self.get_batch(indices)
+
+    def get_batch(self, indices):
+        fields = (self.states, self.actions, self.next_states, self.rewards, self.dones)
+        # jedyną kopią jest indeksowanie tablic, torch.from_numpy jedynie opakowuje wynik
+        batch = [torch.from_numpy(field[indices]) for field in fields]
+        if self.device.type == "cuda":
+            # z pamięci przypiętej kopiowanie na GPU może odbywać się asynchronicznie
+            batch = [tensor.pin_memory().to(self.device, non_blocking=True) for tensor in batch]
+        return tuple(batch)
 
     def __len__(self):
-        return len(self.buffer)
+        return self.size
+
+
+class SegmentTree:
+    # drzewo przedziałowe zapisane w jednej tablicy: liście w tree[capacity:], korzeń w tree[1]
+    # każdy węzeł przechowuje wynik operacji (suma / minimum) na swoich dzieciach
+
+    def __init__(self, capacity, operation, scalar_operation, neutral):
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.capacity = size
+        self.operation = operation  # wersja wektorowa (ufunc NumPy)
+        self.scalar_operation = scalar_operation  # to samo dla pojedynczych liczb, bez narzutu NumPy
+        self.tree = np.full(2 * size, neutral, dtype=np.float64)
+
+    def update_one(self, index, value):
+        # pojedyncza zmiana liścia, O(log n) bez narzutu operacji wektorowych
+        tree = self.tree
+        i = index + self.capacity
+        tree[i] = value
+        i //= 2
+        while i >= 1:
+            tree[i] = self.scalar_operation(tree.item(2 * i), tree.item(2 * i + 1))
+            i //= 2
+
+    def update(self, indices, values):
+        # zmiana wielu liści naraz, węzły każdego poziomu przeliczane są jedną operacją
+        # powtarzające się węzły dostają po prostu tę samą wartość, więc nie trzeba ich usuwać
+        nodes = np.asarray(indices) + self.capacity
+        self.tree[nodes] = values
+        nodes = nodes // 2
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.operation(self.tree[2 * nodes], self.tree[2 * nodes + 1])
+            nodes //= 2
+
+    def root(self):
+        return self.tree[1]
+
+
+class SumTree(SegmentTree):
+    def __init__(self, capacity):
+        super().__init__(capacity, np.add, operator.add, 0.0)
+
+    def find(self, values):
+        # dla każdej wartości z [0, suma) indeks liścia, w którego przedziale sum prefiksowych leży
+        nodes = np.ones(len(values), dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        while nodes[0] < self.capacity:
+            left = 2 * nodes
+            left_values = self.tree[left]
+            go_right = values >= left_values
+            values -= left_values * go_right
+            nodes = left + go_right
+        return nodes - self.capacity
+
+
+class MinTree(SegmentTree):
+    def __init__(self, capacity):
+        super().__init__(capacity, np.minimum, min, np.inf)
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    # bufor z priorytetami: przejścia losowane proporcjonalnie do |błąd TD| ** alpha,
+    # a wagi importance sampling (beta rośnie do 1) korygują wprowadzone w ten sposób obciążenie
+
+    def __init__(self, capacity, state_dim=4, device="cpu", alpha=0.6, beta=0.4, beta_increment=1e-5,
+                 epsilon=1e-5, n_step=1, gamma=0.99, seed=None):
+        super().__init__(capacity, state_dim, device, n_step, gamma, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon  # żeby żadne przejście nie miało zerowego priorytetu
+        self.max_priority = 1.0
+        self.sum_tree = SumTree(capacity)
+        self.min_tree = MinTree(capacity)
+
+    def store(self, state, action, new_state, reward, done):
+        # nowe przejścia dostają największy dotychczasowy priorytet, więc zostaną wylosowane choć raz
+        index = self.position
+        super().store(state, action, new_state, reward, done)
+        priority = self.max_priority ** self.alpha
+        self.sum_tree.update_one(index, priority)
+        self.min_tree.update_one(index, priority)
+
+    def push_batch(self, states, actions, new_states, rewards, dones):
+        indices = (self.position + np.arange(len(actions))) % self.capacity
+        super().push_batch(states, actions, new_states, rewards, dones)
+        self.sum_tree.update(indices, self.max_priority ** self.alpha)
+        self.min_tree.update(indices, self.max_priority ** self.alpha)
+
+    def sample(self, batch_size):
+        # losowanie warstwowe: przedział [0, suma priorytetów) dzielimy na batch_size równych części
+        # zwraca to samo co ReplayBuffer.sample oraz wagi (B, 1) i indeksy do update_priorities
+        total = self.sum_tree.root()
+        segment = total / batch_size
+        values = (np.arange(batch_size) + self.random.random(batch_size)) * segment
+        indices = np.minimum(self.sum_tree.find(values), self.size - 1)
+
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        probabilities = self.sum_tree.tree[indices + self.sum_tree.capacity] / total
+        max_weight = (self.min_tree.root() / total * self.size) ** -self.beta
+        weights = (probabilities * self.size) ** -self.beta / max_weight
+
+        weights = torch.from_numpy(weights.astype(np.float32)).unsqueeze(1)
+        if self.device.type == "cuda":
+            weights = weights.pin_memory().to(self.device, non_blocking=True)
+        return self.get_batch(indices) + (weights, indices)
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.sum_tree.update(indices, priorities ** self.alpha)
+        self.min_tree.update(indices, priorities ** self.alpha)
+
+    def reset_priorities(self):
+        # wszystkie zapisane przejścia dostają ten sam, największy priorytet (np. po wczytaniu z pliku)
+        indices = np.arange(self.size)
+        if len(indices):
+            self.sum_tree.update(indices, self.max_priority ** self.alpha)
+            self.min_tree.update(indices, self.max_priority ** self.alpha)
@@ -0,0 +1,44 @@
+import os
+from functools import lru_cache
+
+import pygame
+
+from flappy_env import FISH_BOX, UPPER_PIPE_BOX, BOTTOM_PIPE_BOX, boxes_overlap
+
+# wspólna pamięć podręczna obrazków i masek, każdy plik wczytywany jest z dysku tylko raz
+
+
+@lru_cache(maxsize=None)
+def load_image(name, flipped=False):
+    image = pygame.image.load(os.path.join("images", name))
+    if flipped:
+        image = pygame.transform.flip(image, False, True)
+    return image
+
+
+@lru_cache(maxsize=None)
+def load_mask(name, flipped=False):
+    return pygame.mask.from_surface(load_image(name, flipped))
+
+
+class MaskCollision:
+    # kolizja ptaka z rurą liczona na maskach pikselowych z pygame, tak jak w oryginalnej grze
+    # bounding_boxes=True - maski porównujemy tylko gdy prostokąty ograniczające na siebie nachodzą
+    # obiekt podaje się jako pipe_collision do FlappyEnv
+
+    def __init__(self, bounding_boxes=True):
+        self.bounding_boxes = bounding_boxes
+        self.fish_mask = load_mask("flappy.png")
+        self.upper_pipe_mask = load_mask("pipe.png", True)
+        self.bottom_pipe_mask = load_mask("pipe.png")
+
+    def __call__(self, fish, pipe):
+        upper_offset = (pipe.x_position - fish.x_position, pipe.upper_y_position - fish.y_position)
+        bottom_offset = (pipe.x_position - fish.x_position, pipe.bottom_y_position - fish.y_position)
+        return self.overlap(self.upper_pipe_mask, UPPER_PIPE_BOX, upper_offset) \
+            or self.overlap(self.bottom_pipe_mask, BOTTOM_PIPE_BOX, bottom_offset)
+
+    def overlap(self, pipe_mask, pipe_box, offset):
+        if self.bounding_boxes and not boxes_overlap(FISH_BOX, pipe_box, offset):
+            return False
+        return self.fish_mask.overlap(pipe_mask, offset) is not None
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+import torch
+
+from Agent_class import Agent
+from ReplayBuffer import ReplayBuffer, PrioritizedReplayBuffer
+from flappy_env import FlappyEnv
+from vec_env import VecFlappyEnv
+
+# pomiary wydajności z ustalonymi seedami, wyniki zapisywane jako JSON,
+# żeby dało się porównać je między commitami:
+#   python benchmark.py --output before.json
+#   python benchmark.py --output after.json --compare before.json
+
+
+def latency_stats(function, repeats):
+    # czas pojedynczych wywołań w mikrosekundach: mediana, p99 i średnia
+    times = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        times[i] = time.perf_counter() - start
+    times *= 1e6
+    return {"p50_us": float(np.percentile(times, 50)), "p99_us": float(np.percentile(times, 99)),
+            "mean_us": float(times.mean())}
+
+
+def rate(function, count):
+    # liczba operacji na sekundę, function wykonuje count operacji
+    start = time.perf_counter()
+    function()
+    return count / (time.perf_counter() - start)
+
+
+def random_states(count, seed):
+    return VecFlappyEnv(count, seed).get_state()
+
+
+def bench_env(steps=20000, vec_sizes=(256, 4096), seed=0):
+    # kroki środowiska na sekundę: pojedynczy FlappyEnv (logika Fish/Pipe/check_collision)
+    # oraz VecFlappyEnv, akcje losowe z tym samym prawdopodobieństwem skoku co eksploracja agenta
+    results = {}
+
+    def run_single():
+        env = FlappyEnv(seed)
+        rng = random.Random(seed)
+        for _ in range(steps):
+            _, _, done = env.step(1 if rng.random() < 1 / 20 else 0)
+            if done:
+                env.reset()
+
+    results["flappy_env_steps_per_s"] = rate(run_single, steps)
+
+    for n in vec_sizes:
+        env = VecFlappyEnv(n, seed)
+        rng = np.random.default_rng(seed)
+        vec_steps = max(10, steps // n * 10)
+        actions = rng.random((vec_steps, n)) < 1 / 20
+
+        def run_vec():
+            for step_actions in actions:
+                env.step(step_actions)
+
+        results[f"vec_env_{n}_steps_per_s"] = rate(run_vec, vec_steps * n)
+    return results
+
+
+def bench_replay_buffer(capacities=(10000, 100000, 1000000), pushes=20000, samples=2000, batch_size=32, seed=0):
+    # push i sample dla zwykłego bufora i bufora z priorytetami, bufor najpierw wypełniany do pełna
+    results = {}
+    states = random_states(1000, seed)
+    for capacity in capacities:
+        for name, buffer_class in (("uniform", ReplayBuffer), ("prioritized", PrioritizedReplayBuffer)):
+            buffer = buffer_class(capacity, seed=seed)
+            fill = min(capacity, 100000)
+            buffer.push_batch(np.resize(states, (fill, 4)), np.zeros(fill, dtype=np.int64),
+                              np.resize(states, (fill, 4)), np.full(fill, 0.1), np.zeros(fill))
+
+            def run_push():
+                for i in range(pushes):
+                    buffer.push((states[i % 1000], i % 2, states[(i + 1) % 1000], 0.1, False))
+
+            def run_sample():
+                for _ in range(samples):
+                    batch = buffer.sample(batch_size)
+                    if name == "prioritized":
+                        buffer.update_priorities(batch[-1], np.ones(batch_size))
+
+            results[f"{name}_{capacity}"] = {"push_per_s": rate(run_push, pushes),
+                                             "sample_per_s": rate(run_sample, samples)}
+    return results
+
+
+def bench_train(batch_sizes=(32, 128, 512), updates=300, seed=0):
+    # kroki Agent.train() na sekundę dla różnych wielkości próbek
+    results = {}
+    states = random_states(1000, seed)
+    for batch_size in batch_sizes:
+        agent = Agent(4, 2, seed=seed)
+        agent.batch_size = batch_size
+        agent.replay_buffer.push_batch(states, np.arange(1000) % 2, np.roll(states, -1, axis=0),
+                                       np.full(1000, 0.1), np.zeros(1000))
+        agent.train()  # rozgrzewka
+
+        def run_train():
+            for _ in range(updates):
+                agent.train()
+
+        results[f"batch_{batch_size}_updates_per_s"] = rate(run_train, updates)
+    return results
+
+
+def bench_decision_latency(repeats=10000, batch_sizes=(64, 1024), seed=0):
+    # czas decyzji agenta dla pojedynczego stanu (select_action) i wielu stanów naraz (select_actions)
+    # dla każdego sposobu liczenia sieci, w przypadku wsadów czas przeliczony na jedną decyzję
+    states = random_states(max(batch_sizes), seed)
+    results = {}
+    for inference in ("torch", "numpy"):
+        agent = Agent(4, 2, inference=inference, seed=seed)
+        agent.epsilon = 0
+        state = states[0].tolist()
+        results[inference] = {"single": latency_stats(lambda: agent.select_action(state), repeats)}
+        for batch_size in batch_sizes:
+            batch = states[:batch_size]
+            stats = latency_stats(lambda: agent.select_actions(batch), max(10, repeats // batch_size))
+            results[inference][f"batch_{batch_size}"] = {name: value / batch_size for name, value in stats.items()}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(quick=False, seed=0):
+    scale = 10 if quick else 1
+    torch.set_num_threads(1)  # wyniki niezależne od liczby rdzeni maszyny
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "quick": quick,
+        },
+        "env": bench_env(steps=20000 // scale, seed=seed),
+        "replay_buffer": bench_replay_buffer(pushes=20000 // scale, samples=2000 // scale, seed=seed),
+        "train": bench_train(updates=300 // scale, seed=seed),
+        "decision_latency": bench_decision_latency(repeats=10000 // scale, seed=seed),
+    }
+
+
+def flatten(results, prefix=""):
+    # zagnieżdżony słownik wyników jako {"env/flappy_env_steps_per_s": ..., ...}
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "/"))
+        elif isinstance(value, float):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(results, baseline):
+    # zmiana względem poprzedniego pomiaru, dla czasów (_us) mniej znaczy lepiej
+    old = flatten(baseline)
+    for name, value in flatten(results).items():
+        if name in old and old[name]:
+            change = (value / old[name] - 1) * 100
+            better = change < 0 if name.endswith("_us") else change > 0
+            print(f"{name:60} {old[name]:14.2f} -> {value:14.2f} ({change:+6.1f}%{'' if better else ' !'})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flappy Bird DQN performance benchmarks")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", default=None, help="previous JSON results to compare against")
+    parser.add_argument("--quick", action="store_true", help="10x fewer repetitions")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = run_all(args.quick, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    else:
+        for name, value in flatten(results).items():
+            print(f"{name:60} {value:14.2f}")
@@ -0,0 +1,57 @@
+import argparse
+import random
+import sys
+
+from assets import MaskCollision
+from flappy_env import FlappyEnv
+
+# sprawdzenie, czy wszystkie sposoby liczenia kolizji dają identyczne wyniki:
+# epizody nagrywamy (seed + akcje) na kształtach z flappy_env, a następnie odtwarzamy je
+# na maskach pikselowych z pygame (z prostokątami ograniczającymi i bez nich)
+# repozytorium nie ma zestawu testów, więc to jest test uruchamiany ręcznie (lub w CI) po każdej zmianie
+# kształtów z flappy_env, MaskCollision albo fizyki gry:
+#   python check_collision.py --episodes 200
+# kod wyjścia 0 - wszystkie sposoby się zgadzają, 1 - pierwsza niezgodność (wypisywany jest jej epizod)
+
+
+def record_episode(seed):
+    # prosta losowa strategia, która dolatuje do rur i często w nie uderza
+    env = FlappyEnv(seed)
+    rng = random.Random(seed)
+    state, done, actions = env.get_state(), False, []
+    while not done:
+        action = 1 if state[3] < -150 + rng.randint(-60, 60) and state[1] > 0 else 0
+        state, _, done = env.step(action)
+        actions.append(action)
+    return actions
+
+
+def replay_episode(seed, actions, pipe_collision=None):
+    env = FlappyEnv(seed, pipe_collision)
+    return [env.step(action) for action in actions]
+
+
+def check(episodes=200):
+    # True, gdy wszystkie sposoby liczenia kolizji dają te same przejścia; kończy na pierwszej niezgodności
+    collisions = {
+        "mask": MaskCollision(bounding_boxes=False),
+        "mask + bounding boxes": MaskCollision(bounding_boxes=True),
+    }
+    steps = 0
+    for seed in range(episodes):
+        actions = record_episode(seed)
+        expected = replay_episode(seed, actions)
+        for name, pipe_collision in collisions.items():
+            if replay_episode(seed, actions, pipe_collision) != expected:
+                print(f"Episode {seed}: {name} collisions differ from flappy_env shapes")
+                return False
+        steps += len(actions)
+    print(f"{episodes} episodes, {steps} steps: all collision paths agree")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that mask-based and shape-based collisions agree")
+    parser.add_argument("--episodes", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(0 if check(args.episodes) else 1)
@@ -0,0 +1,131 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+import torch
+
+# zapisywanie stanu treningu bez zatrzymywania gry:
+# - AsyncCheckpointer zapisuje modele i stan optymalizatora w osobnym wątku
+# - ReplayArchive trzyma zawartość bufora pamięci w plikach .npy mapowanych do pamięci,
+#   dopisuje tylko nowe przejścia i wczytuje je leniwie (strony pliku czytane dopiero przy użyciu)
+
+
+def snapshot(obj):
+    # kopia stanu, którą wątek zapisujący może spokojnie zapisać, podczas gdy trening zmienia oryginał
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(value) for value in obj)
+    return obj
+
+
+class AsyncCheckpointer:
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def work(self):
+        while True:
+            function, args = self.jobs.get()
+            try:
+                function(*args)
+            except Exception as error:  # błąd zapisu nie może zatrzymać treningu
+                print(f"Checkpoint failed: {error}")
+            finally:
+                self.jobs.task_done()
+
+    def submit(self, function, *args):
+        self.jobs.put((function, args))
+
+    def save(self, obj, path):
+        # kopia powstaje od razu, samo zapisywanie na dysk odbywa się w tle
+        self.submit(atomic_save, snapshot(obj), path)
+
+    def wait(self):
+        # czekanie na zakończenie wszystkich zleconych zapisów
+        self.jobs.join()
+
+
+def atomic_save(obj, path):
+    # zapis do pliku tymczasowego i podmiana, przerwany zapis nie psuje poprzedniego checkpointu
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    torch.save(obj, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+class ReplayArchive:
+    FIELDS = ("states", "actions", "next_states", "rewards", "dones")
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.arrays = None  # pliki .npy otwarte do zapisu
+        self.saved = 0  # wartość buffer.pushed przy ostatnim zapisie
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open(self, buffer):
+        os.makedirs(self.directory, exist_ok=True)
+        self.arrays = {}
+        for name in self.FIELDS:
+            field = getattr(buffer, name)
+            path = self.path(name + ".npy")
+            if os.path.exists(path) and np.load(path, mmap_mode="r").shape == field.shape:
+                self.arrays[name] = np.load(path, mmap_mode="r+")
+            else:
+                self.arrays[name] = np.lib.format.open_memmap(path, mode="w+", dtype=field.dtype, shape=field.shape)
+                self.saved = 0  # nowy plik, trzeba zapisać cały bufor
+
+    def save(self, buffer):
+        # kopiuje do plików tylko przejścia dodane od ostatniego zapisu (kopiowanie w pamięci, szybkie),
+        # zwraca funkcję, która wymusza zapis na dysk - można ją wykonać w tle
+        if self.arrays is None:
+            self.open(buffer)
+        new = buffer.pushed - self.saved
+        if new >= buffer.capacity or buffer.pushed < self.saved:
+            ranges = [(0, buffer.size)]
+        else:
+            start = (buffer.position - new) % buffer.capacity
+            if start + new <= buffer.capacity:
+                ranges = [(start, start + new)]
+            else:
+                ranges = [(start, buffer.capacity), (0, buffer.position)]
+        for name in self.FIELDS:
+            for begin, end in ranges:
+                self.arrays[name][begin:end] = getattr(buffer, name)[begin:end]
+        self.saved = buffer.pushed
+        meta = {"position": buffer.position, "size": buffer.size, "pushed": buffer.pushed}
+        return lambda: self.flush(meta)
+
+    def flush(self, meta):
+        for array in self.arrays.values():
+            array.flush()
+        # meta zapisujemy na końcu, więc opisuje wyłącznie dane, które są już na dysku
+        with open(self.path("meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(self.path("meta.json.tmp"), self.path("meta.json"))
+
+    def load(self, buffer):
+        # podpina pliki pod bufor w trybie copy-on-write: nic nie jest czytane z góry,
+        # a zmiany w buforze nie trafiają do plików, dopóki nie wywołamy save
+        if not os.path.exists(self.path("meta.json")):
+            return False
+        with open(self.path("meta.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(self.path(name + ".npy"), mmap_mode="c") for name in self.FIELDS}
+        if any(array.shape != getattr(buffer, name).shape for name, array in arrays.items()):
+            return False  # inna pojemność bufora, zaczynamy od pustego
+        for name, array in arrays.items():
+            setattr(buffer, name, array)
+        buffer.position = meta["position"]
+        buffer.size = meta["size"]
+        buffer.pushed = meta["pushed"]
+        self.saved = buffer.pushed
+        return True
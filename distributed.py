@@ -0,0 +1,189 @@
+import argparse
+import os
+import queue
+import time
+from datetime import datetime
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from Agent_class import Agent
+from dqn import DQN
+from metrics import MetricsWriter, TextLog
+from seeding import spawn_seeds
+from vec_env import VecFlappyEnv
+
+# trening rozproszony w stylu Ape-X:
+# K procesów aktorów gra we własne gry (każdy z innym epsilonem) i wysyła przejścia przez kolejkę
+# do jednego procesu uczącego, który ma policy DQN i bufor pamięci;
+# co pewien czas uczący publikuje nowe wagi w pamięci współdzielonej, a aktorzy je pobierają
+
+
+def actor_epsilon(actor_id, actors, base=0.4, alpha=7):
+    # stały epsilon każdego aktora, od 0.4 do 0.4 ** 8, jak w pracy o Ape-X
+    if actors == 1:
+        return base
+    return base ** (1 + actor_id / (actors - 1) * alpha)
+
+
+def actor(actor_id, epsilon, envs, shared_policy, version, lock, transitions, stop, seed, send_every):
+    torch.set_num_threads(1)
+    env_seed, explore_seed = spawn_seeds(seed, 2)  # osobne strumienie dla rur i eksploracji
+    rng = np.random.default_rng(explore_seed)
+    env = VecFlappyEnv(envs, env_seed)
+    policy = DQN(4, 2, shared_policy.fc1.out_features, shared_policy.value is not None)
+    local_version = -1
+
+    states = env.get_state()
+    buffer = []
+    finished_scores = []
+    steps = 0
+    while not stop.is_set():
+        # pobranie nowych wag, jeśli uczący je opublikował
+        if version.value != local_version:
+            with lock:
+                policy.load_state_dict(shared_policy.state_dict())
+                local_version = version.value
+
+        with torch.no_grad():
+            actions = policy(torch.from_numpy(states)).argmax(1).numpy()
+        explore = rng.random(envs) < epsilon
+        actions = np.where(explore, rng.random(envs) < 1 / 20, actions).astype(np.int64)
+
+        # wyniki zapamiętujemy przed krokiem, bo zakończone gry są w nim od razu restartowane
+        # (w kroku kończącym grę nie da się zdobyć punktu)
+        scores = env.score.copy()
+        new_states, rewards, dones = env.step(actions)
+        buffer.append((states, actions, new_states, rewards, dones))
+        finished_scores.extend(scores[dones].tolist())
+        states = env.get_state()
+        steps += 1
+
+        if steps % send_every == 0:
+            batch = tuple(np.concatenate(field) for field in zip(*buffer))
+            transitions.put((actor_id, batch, finished_scores))
+            buffer = []
+            finished_scores = []
+
+
+def learner(agent, shared_policy, version, lock, transitions, seconds, publish_every, log, metrics=None):
+    # główna pętla uczącego: odbiór przejść, trening, publikowanie wag
+    # metrics - MetricsWriter, do którego co raport trafia rekord z szybkością, kosztem i średnim wynikiem
+    start = time.time()
+    received = 0
+    scores = []
+    last_report = start
+    last_publish = 0
+    last_received, last_total, last_count = 0, 0.0, 0
+    while time.time() - start < seconds:
+        try:
+            while True:
+                actor_id, batch, finished_scores = transitions.get_nowait()
+                agent.replay_buffer.push_batch(*batch)
+                received += len(batch[1])
+                scores.extend(finished_scores)
+        except queue.Empty:
+            pass
+
+        if len(agent.replay_buffer) < agent.batch_size:
+            time.sleep(0.01)
+            continue
+
+        # uczący nie gra, więc pomija licznik kroków gry z Agent.train i od razu wykonuje cały blok kroków treningu
+        agent.learn(agent.updates_per_train)
+        if agent.train_step_counter - last_publish >= publish_every:
+            last_publish = agent.train_step_counter
+            with lock:
+                shared_policy.load_state_dict(agent.policy.state_dict())
+                version.value += 1
+
+        if time.time() - last_report >= 10:
+            elapsed = time.time() - start
+            average = sum(scores) / len(scores) if scores else 0
+            log(f"{elapsed:.0f}s: {received / elapsed:.0f} env steps/s, "
+                f"{agent.train_step_counter / elapsed:.0f} updates/s, "
+                f"{len(scores)} games, average score: {average:.2f}")
+            if metrics is not None:
+                total, count = float(agent.loss_total), agent.loss_count
+                window = time.time() - last_report
+                metrics.record("steps", step=received, steps_per_s=(received - last_received) / window,
+                               updates_per_s=(count - last_count) / window,
+                               loss=(total - last_total) / (count - last_count) if count > last_count else None,
+                               games=len(scores), score=average)
+                last_received, last_total, last_count = received, total, count
+            scores = []
+            last_report = time.time()
+
+
+def train_distributed(actors=8, envs_per_actor=16, seconds=3600, filename=None, publish_every=400, send_every=32,
+                      agent_options=None, seed=None):
+    if filename is None:
+        filename = "apex_" + datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    os.makedirs("logs", exist_ok=True)
+    os.makedirs("saved_agents", exist_ok=True)
+
+    text_log = TextLog("logs/log_" + filename + ".txt")
+    metrics = MetricsWriter("logs/metrics_" + filename + ".jsonl")
+
+    def log(message):
+        print(message)
+        text_log.log(message)
+
+    ctx = mp.get_context("spawn")
+    # seed - z niego powstają niezależne strumienie liczb losowych uczącego i każdego aktora
+    agent_seed, *actor_seeds = spawn_seeds(seed, actors + 1)
+    agent = Agent(4, 2, **{"seed": agent_seed, **(agent_options or {})})
+    if agent.n_step > 1:
+        # aktorzy wysyłają przejścia jednokrokowe z wielu środowisk przemieszanych ze sobą
+        raise ValueError("n-step returns are not supported in distributed training")
+    shared_policy = DQN(4, 2, agent.hidden_dim, agent.dueling)
+    shared_policy.load_state_dict(agent.policy.state_dict())
+    shared_policy.share_memory()
+    version = ctx.Value("i", 0)
+    lock = ctx.Lock()
+    # ograniczona kolejka - gdy uczący nie nadąża, aktorzy czekają zamiast zapełniać pamięć
+    transitions = ctx.Queue(maxsize=4 * actors)
+    stop = ctx.Event()
+
+    processes = []
+    for actor_id in range(actors):
+        epsilon = actor_epsilon(actor_id, actors)
+        process = ctx.Process(target=actor, args=(actor_id, epsilon, envs_per_actor, shared_policy, version, lock,
+                                                  transitions, stop, actor_seeds[actor_id], send_every),
+                              daemon=True)
+        process.start()
+        processes.append(process)
+
+    log(f"Start of distributed training: {actors} actors x {envs_per_actor} envs")
+    try:
+        learner(agent, shared_policy, version, lock, transitions, seconds, publish_every, log, metrics)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        # opróżniamy kolejkę, żeby aktorzy zablokowani na put mogli się zakończyć
+        while any(process.is_alive() for process in processes):
+            try:
+                transitions.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in processes:
+            process.join()
+
+    torch.save(agent.policy.state_dict(), "saved_agents/" + filename + ".pt")
+    log("Agent saved")
+    text_log.close()
+    metrics.close()
+    return agent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ape-X style training with parallel actors")
+    parser.add_argument("--actors", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--envs-per-actor", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=3600)
+    parser.add_argument("--filename", default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    train_distributed(args.actors, args.envs_per_actor, args.seconds, args.filename, seed=args.seed)
@@ -3,11 +3,16 @@ import torch.nn.functional as F
 
 
 class DQN(nn.Module):
-    def __init__(self, input_dim, output_dim, hidden_dim=512):
+    # dueling - osobna ocena stanu (value) i przewaga akcji (fc2): Q = V + A - średnia(A)
+    def __init__(self, input_dim, output_dim, hidden_dim=512, dueling=False):
         super(DQN, self).__init__()
         self.fc1 = nn.Linear(input_dim, hidden_dim)
         self.fc2 = nn.Linear(hidden_dim, output_dim)
+        self.value = nn.Linear(hidden_dim, 1) if dueling else None
 
     def forward(self, x):
         x = F.relu(self.fc1(x))
-        return self.fc2(x)
\ No newline at end of file
+        if self.value is None:
+            return self.fc2(x)
+        advantages = self.fc2(x)
+        return self.value(x) + advantages - advantages.mean(-1, keepdim=True)
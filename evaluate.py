@@ -0,0 +1,131 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import numpy as np
+
+from numpy_dqn import NumpyDQN
+from flappy_env import FlappyEnv
+from stats import ScoreStats
+from traces import Trace, TraceWriter
+
+# ocena zapisanych agentów bez okna: M gier z kolejnymi seedami rozdzielonych między procesy,
+# wyniki zbierane strumieniowo (ScoreStats), podsumowanie zapisywane do logs/eval_<nazwa>.json
+# uruchomienie: python evaluate.py bestAgent 1hour --episodes 10000
+# --record-below 5 zapisuje gry z wynikiem poniżej 5 do traces/eval_<nazwa>.trc (podgląd: python traces.py play ...)
+
+policy = None  # sieć agenta w procesie roboczym, wczytywana raz przez init_worker
+
+
+def load_policy(path):
+    # .npz - agent wyeksportowany przez export.py, w przeciwnym razie state_dict z torch.save
+    # torch wczytywany jest tylko dla .pt, więc ocena i gra agentów .npz działają bez niego
+    if path.endswith(".npz"):
+        return NumpyDQN.load(path)
+    import torch
+    torch.set_num_threads(1)
+    return NumpyDQN.from_state_dict(torch.load(path, map_location="cpu"))
+
+
+def init_worker(path):
+    global policy
+    policy = load_policy(path)
+
+
+def play_episodes(seeds, max_steps, action_repeat=1, record_below=None, concurrent=64, network=None):
+    # gra kilka epizodów naraz, żeby decyzje sieci liczyć jednym mnożeniem macierzy
+    # epizody dłuższe niż max_steps są przerywane (dobry agent mógłby grać w nieskończoność)
+    # record_below - zwraca też zapisy (traces.Trace) gier z wynikiem mniejszym niż ta wartość
+    # network - sieć do oceny zamiast wczytanej w procesie roboczym (np. w export.py)
+    network = network or policy
+    stats = ScoreStats()
+    truncated = 0
+    traces = []
+    seeds = iter(seeds)
+    env_seeds = [seed for _, seed in zip(range(concurrent), seeds)]
+    envs = [FlappyEnv(seed, action_repeat=action_repeat) for seed in env_seeds]
+    actions_history = [bytearray() for _ in envs]
+    steps = [0] * len(envs)
+    while envs:
+        states = np.array([env.get_state() for env in envs], dtype=np.float32)
+        actions = network(states).argmax(axis=1)
+        for i in reversed(range(len(envs))):
+            _, _, done = envs[i].step(actions[i])
+            steps[i] += 1
+            if record_below is not None:
+                actions_history[i].append(actions[i])
+            if done or steps[i] >= max_steps:
+                stats.add(envs[i].score)
+                truncated += not done
+                if record_below is not None and envs[i].score < record_below:
+                    traces.append(Trace(env_seeds[i], actions_history[i], action_repeat, envs[i].score, done))
+                seed = next(seeds, None)
+                if seed is None:
+                    del envs[i]
+                    del env_seeds[i]
+                    del actions_history[i]
+                    del steps[i]
+                else:
+                    envs[i] = FlappyEnv(seed, action_repeat=action_repeat)
+                    env_seeds[i] = seed
+                    actions_history[i] = bytearray()
+                    steps[i] = 0
+    return stats, truncated, traces
+
+
+def evaluate(name, episodes=10000, workers=None, seed=0, max_steps=100000, chunk_size=100, action_repeat=1,
+             record_below=None):
+    # action_repeat - jak w Game, dla agentów trenowanych z powtarzaniem akcji; max_steps liczy wtedy decyzje
+    path = "saved_agents/" + name + ("" if name.endswith(".npz") else ".pt")
+    name = name.removesuffix(".npz")  # nazwa logu i zapisów bez rozszerzenia, np. logs/eval_bestAgent_lite.json
+    start = time.time()
+    stats = ScoreStats()
+    truncated = 0
+    writer = TraceWriter("traces/eval_" + name + ".trc", append=False) if record_below is not None else None
+    chunks = [range(first, min(first + chunk_size, seed + episodes))
+              for first in range(seed, seed + episodes, chunk_size)]
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn"), initializer=init_worker,
+                             initargs=(path,)) as pool:
+        futures = [pool.submit(play_episodes, chunk, max_steps, action_repeat, record_below) for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), 1):
+            chunk_stats, chunk_truncated, traces = future.result()
+            stats.merge(chunk_stats)
+            truncated += chunk_truncated
+            for trace in traces:
+                writer.write(trace)
+            if done % max(1, len(chunks) // 20) == 0 or done == len(chunks):
+                print(f"{name}: {stats.count}/{episodes}. Average: {stats.mean:.2f}, Median: {stats.median():g}, "
+                      f"Range: {stats.min} - {stats.max}")
+
+    if writer is not None:
+        writer.close()
+
+    summary = {"agent": name, "seed": seed, "max_steps": max_steps, "action_repeat": action_repeat,
+               "truncated": truncated, "seconds": time.time() - start}
+    summary.update(stats.summary())
+    os.makedirs("logs", exist_ok=True)
+    with open("logs/eval_" + name + ".json", "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless parallel evaluation of saved agents")
+    parser.add_argument("agents", nargs="*", help="names from saved_agents/, .npz with extension (default: all .pt)")
+    parser.add_argument("--episodes", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=100000)
+    parser.add_argument("--action-repeat", type=int, default=1)
+    parser.add_argument("--record-below", type=int, default=None, help="record episodes scoring below this value")
+    args = parser.parse_args()
+
+    agents = args.agents or sorted(os.path.splitext(os.path.basename(path))[0]
+                                   for path in glob.glob("saved_agents/*.pt"))
+    for agent in agents:
+        evaluate(agent, args.episodes, args.workers, args.seed, args.max_steps, action_repeat=args.action_repeat,
+                 record_below=args.record_below)
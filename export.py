@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from benchmark import latency_stats
+from dqn import DQN
+from evaluate import evaluate, load_policy, play_episodes
+from flappy_env import FlappyEnv
+from numpy_dqn import NumpyDQN
+from seeding import spawn_seeds, int_seed
+
+# eksport zapisanego agenta do lekkiego pliku .npz uruchamianego przez numpy_dqn.NumpyDQN bez torcha:
+# - destylacja: mniejsza sieć (np. 32 neurony zamiast 512) uczona odtwarzać wartości Q oryginału,
+#   w kolejnych rundach na stanach z gier samego ucznia (DAgger), wybierana jest runda z najlepszym wynikiem
+# - kwantyzacja: wagi int8 ze skalą dla każdego neuronu
+# --compare porównuje czas decyzji, uruchomienia, pamięć i wyniki z oryginalnym .pt
+# uruchomienie: python export.py bestAgent --hidden 32 --compare
+
+
+def collect_states(teacher, episodes=200, seed=0, epsilon=0.1, max_steps=5000):
+    # stany z gier nauczyciela, z odrobiną losowych ruchów, żeby uczeń widział też mniej typowe sytuacje
+    rng = np.random.default_rng(seed)
+    states = []
+    for episode in range(episodes):
+        env = FlappyEnv(seed + episode)
+        state = env.get_state()
+        for _ in range(max_steps):
+            states.append(state)
+            if rng.random() < epsilon:
+                action = int(rng.random() < 1 / 20)
+            else:
+                action = int(teacher(np.asarray(state, dtype=np.float32)).argmax())
+            state, _, done = env.step(action)
+            if done:
+                break
+    return np.array(states, dtype=np.float32)
+
+
+def fit_student(teacher, states, hidden_dim=32, epochs=30, batch_size=1024, alpha=0.003, seed=0):
+    # uczeń uczy się wartości Q nauczyciela (MSE) i, z większą wagą, różnicy między nimi - to ona wybiera akcję
+    # wejścia są normalizowane na czas nauki, a potem normalizacja jest wliczana w wagi fc1
+    init_seed, shuffle_seed = spawn_seeds(seed, 2)
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(int_seed(init_seed))
+        student = DQN(states.shape[1], teacher.fc2_bias.shape[0], hidden_dim)
+    steps = epochs * -(-len(states) // batch_size)
+    optimizer = torch.optim.Adam(student.parameters(), lr=alpha)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, steps)
+    cost_function = nn.MSELoss()
+    rng = np.random.default_rng(shuffle_seed)
+    mean, std = states.mean(axis=0), states.std(axis=0) + 1e-6
+    inputs = torch.from_numpy((states - mean) / std)
+    targets = torch.from_numpy(teacher(states).astype(np.float32))
+    for epoch in range(epochs):
+        order = torch.from_numpy(rng.permutation(len(states)))
+        for first in range(0, len(states), batch_size):
+            batch = order[first:first + batch_size]
+            q_values = student(inputs[batch])
+            cost = cost_function(q_values, targets[batch]) + 10 * cost_function(
+                q_values[:, 1] - q_values[:, 0], targets[batch, 1] - targets[batch, 0])
+            optimizer.zero_grad()
+            cost.backward()
+            optimizer.step()
+            scheduler.step()
+    with torch.no_grad():
+        student.fc1.bias -= student.fc1.weight @ torch.from_numpy(mean / std)
+        student.fc1.weight /= torch.from_numpy(std)
+    return NumpyDQN.from_module(student)
+
+
+def distill(teacher, states, hidden_dim=32, rounds=3, episodes=200, validation_episodes=200, max_steps=20000,
+            seed=0):
+    # DAgger: po każdej rundzie uczeń gra sam, a jego stany (z wartościami Q nauczyciela) dochodzą do danych,
+    # dzięki temu uczy się też sytuacji, do których doprowadzają jego własne błędy
+    # zwraca ucznia z najlepszą średnią na osobnych seedach walidacyjnych
+    validation_seeds = range(seed + 2 * 10 ** 6, seed + 2 * 10 ** 6 + validation_episodes)
+    best, best_score = None, -float("inf")
+    for round_number in range(rounds + 1):
+        student = fit_student(teacher, states, hidden_dim, seed=seed + round_number)
+        score = play_episodes(validation_seeds, max_steps, network=student)[0].mean
+        print(f"Round {round_number}: {len(states)} states, validation average score: {score:.2f}")
+        if score > best_score:
+            best, best_score = student, score
+        if round_number < rounds:
+            new_states = collect_states(student, episodes, seed + (round_number + 1) * 10 ** 4, epsilon=0.05)
+            states = np.concatenate([states, new_states])
+    return best
+
+
+def agreement(policy, other, states):
+    # odsetek stanów, w których obie sieci wybierają tę samą akcję
+    return float((policy(states).argmax(axis=1) == other(states).argmax(axis=1)).mean())
+
+
+def export(name, hidden_dim=32, quantize=True, episodes=200, seed=0):
+    # zapisuje saved_agents/<nazwa>_lite.npz, hidden_dim=None - bez destylacji, tylko kwantyzacja
+    teacher = load_policy("saved_agents/" + name + ".pt")
+    states = collect_states(teacher, episodes, seed)
+    student = distill(teacher, states, hidden_dim, seed=seed) if hidden_dim else teacher
+    path = "saved_agents/" + name + "_lite.npz"
+    student.save(path, quantize)
+    print(f"Exported {path}: {os.path.getsize(path)} bytes, "
+          f"agreement with {name}: {agreement(teacher, NumpyDQN.load(path), states):.4f} on {len(states)} states")
+    return path
+
+
+def startup_seconds(code, repeats=3):
+    # czas uruchomienia nowego interpretera, wczytania sieci i jednej decyzji
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def compare(name, lite_path, episodes=1000, workers=None, seed=0):
+    pt_path = "saved_agents/" + name + ".pt"
+    original = load_policy(pt_path)
+    model = DQN(4, 2, original.fc1_bias.shape[0], original.value_weight is not None)
+    model.load_state_dict(torch.load(pt_path))
+    lite = NumpyDQN.load(lite_path)
+    states = collect_states(original, 20, seed + 10 ** 6)
+    state = states[len(states) // 2]
+
+    def torch_action():
+        # tak jak tryb test z torchem: tensor, forward bez gradientu, argmax
+        with torch.no_grad():
+            return model(torch.FloatTensor(state).unsqueeze(0)).argmax().item()
+
+    setup = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); "
+             "import numpy as np; state = np.zeros(4, dtype=np.float32); ")
+    results = {
+        "agent": name,
+        "lite": lite_path,
+        "file_bytes": {"pt": os.path.getsize(pt_path), "lite": os.path.getsize(lite_path)},
+        "memory_bytes": {"pt": sum(p.numel() * p.element_size() for p in model.parameters()),
+                         "lite": lite.nbytes()},
+        "decision_latency_us": {
+            "torch": latency_stats(torch_action, 5000),
+            "numpy_pt": latency_stats(lambda: int(original(state).argmax()), 5000),
+            "numpy_lite": latency_stats(lambda: int(lite(state).argmax()), 5000),
+        },
+        "startup_seconds": {
+            "torch": startup_seconds(setup + "import torch; from dqn import DQN; "
+                                     f"m = DQN(4, 2, {model.fc1.out_features}, {model.value is not None}); "
+                                     f"m.load_state_dict(torch.load({pt_path!r})); "
+                                     "m(torch.from_numpy(state)).argmax().item()"),
+            "numpy_lite": startup_seconds(setup + "from numpy_dqn import NumpyDQN; "
+                                          f"int(NumpyDQN.load({lite_path!r})(state).argmax())"),
+        },
+        "agreement": agreement(original, lite, states),
+        "score": {
+            "pt": evaluate(name, episodes, workers, seed),
+            "lite": evaluate(os.path.basename(lite_path), episodes, workers, seed),
+        },
+    }
+    os.makedirs("logs", exist_ok=True)
+    with open("logs/export_" + name + ".json", "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'':12}{'.pt':>14}{'lite':>14}")
+    print(f"{'file bytes':12}{results['file_bytes']['pt']:>14}{results['file_bytes']['lite']:>14}")
+    print(f"{'memory bytes':12}{results['memory_bytes']['pt']:>14}{results['memory_bytes']['lite']:>14}")
+    latency = results["decision_latency_us"]
+    print(f"{'decision us':12}{latency['torch']['mean_us']:>14.2f}{latency['numpy_lite']['mean_us']:>14.2f}"
+          f"   (numpy on .pt weights: {latency['numpy_pt']['mean_us']:.2f})")
+    startup = results["startup_seconds"]
+    print(f"{'startup s':12}{startup['torch']:>14.3f}{startup['numpy_lite']:>14.3f}")
+    score = results["score"]
+    print(f"{'mean score':12}{score['pt']['mean']:>14.2f}{score['lite']['mean']:>14.2f}")
+    print(f"{'median':12}{score['pt']['percentiles']['50']:>14g}{score['lite']['percentiles']['50']:>14g}")
+    print(f"Action agreement: {results['agreement']:.4f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a saved agent to a small NumPy-only .npz policy")
+    parser.add_argument("agent", help="name from saved_agents/")
+    parser.add_argument("--hidden", type=int, default=32,
+                        help="hidden size of the distilled network, 0 - no distillation")
+    parser.add_argument("--no-quantize", action="store_true", help="keep float32 weights")
+    parser.add_argument("--episodes", type=int, default=200, help="teacher games used for distillation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", action="store_true", help="benchmark the export against the original .pt")
+    parser.add_argument("--compare-episodes", type=int, default=1000)
+    args = parser.parse_args()
+
+    lite_path = export(args.agent, args.hidden or None, not args.no_quantize, args.episodes, args.seed)
+    if args.compare:
+        compare(args.agent, lite_path, args.compare_episodes, seed=args.seed)
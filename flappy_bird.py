@@ -1,152 +1,88 @@
 import pygame
-import random
 import os
-import math
+import random
+import time
 import matplotlib.pyplot as plt
 from datetime import datetime
 
-import torch
-
-from Agent_class import Agent
+import numpy as np
 
-from pygame.math import VectorElementwiseProxy
-
-WINDOW_HEIGHT = 750
-WINDOW_WIDTH = 550
-BACKGROUND_IMG = pygame.image.load(os.path.join("images", "background.png"))
-SPEED = 2
-JUMP = 18
+from assets import MaskCollision
+from evaluate import load_policy
+from flappy_env import FlappyEnv, WINDOW_HEIGHT, WINDOW_WIDTH, SPEED
+from metrics import Curve, MetricsWriter, TextLog, read_metrics
+from numpy_dqn import PolicyStack
+from population import PopulationEnv
+from profiler import Profiler, NULL_PROFILER
+from renderer import Renderer
+from stats import ScoreStats
+from traces import TraceRecorder, TraceWriter, fill_replay_buffer
+from training import AgentRunner
 
 # rewards_per_game = []
-rewards_per_20_games = []
-epsilon_per_game = []
 round_count = 0
 best_reward = -float("inf")
 
 
-def median(arr):
-    mid = len(arr) // 2
-    if len(arr) % 2 == 1:
-        return arr[mid]
-    return (arr[mid] + arr[mid - 1]) / 2
-
-
-class Fish:
-    def __init__(self):
-        self.x_position = 50
-        self.y_position = WINDOW_HEIGHT / 3
-        self.image = pygame.image.load(os.path.join("images", "flappy.png"))
-        self.jump_velocity = -JUMP
-        self.velocity = self.jump_velocity
-        self.acceleration = 2
-
-    def jump(self):
-        self.velocity = self.jump_velocity
-
-    def move(self):
-        self.y_position += self.velocity
-        self.velocity += self.acceleration
-
-        if self.velocity >= 20:
-            self.velocity = 20
-
-    def draw(self, win):
-        win.blit(self.image, (self.x_position, self.y_position))
-
-    def get_mask(self):
-        return pygame.mask.from_surface(self.image)
-
-    def check_base_collision(self, base):
-        return self.y_position + self.image.get_height() >= base.y_position
-
-    def check_pipe_collision(self, pipe):
-        fish_mask = self.get_mask()
-        upper_pipe_mask = pipe.get_upper_mask()
-        bottom_pipe_mask = pipe.get_bottom_mask()
-        upper_offset = (pipe.x_position - self.x_position, pipe.upper_y_position - self.y_position)
-        bottom_offset = (pipe.x_position - self.x_position, pipe.bottom_y_position - self.y_position)
-        return fish_mask.overlap(upper_pipe_mask, upper_offset) or fish_mask.overlap(bottom_pipe_mask, bottom_offset)
-
-    def check_roof_collision(self):
-        return self.y_position <= 0
-
-
-class Pipe:
-    GAP = 250
-    UPPER_LIMIT = 50  # górna granica ograniczająca pozycję rury
-    BOTTOM_LIMIT = 320  # dolna granica
-
-    def __init__(self, x):
-        self.x_position = x
-        self.bottom_image = pygame.image.load(os.path.join("images", "pipe.png"))
-        self.upper_image = pygame.transform.flip(self.bottom_image, False, True)
-        height = self.upper_image.get_height()
-        self.upper_y_position = random.randint(Pipe.UPPER_LIMIT - height, Pipe.BOTTOM_LIMIT - height)
-        self.bottom_y_position = self.upper_y_position + Pipe.GAP + self.upper_image.get_height()
-        self.velocity = 5 * SPEED
-        self.passed = False
-
-    def move(self):
-        self.x_position -= self.velocity
-
-    def draw(self, win):
-        win.blit(self.upper_image, (self.x_position, self.upper_y_position))
-        win.blit(self.bottom_image, (self.x_position, self.bottom_y_position))
-
-    def get_upper_mask(self):
-        return pygame.mask.from_surface(self.upper_image)
-
-    def get_bottom_mask(self):
-        return pygame.mask.from_surface(self.bottom_image)
-
-    def get_borders(self):
-        top_pipe_border = self.upper_y_position + self.upper_image.get_height()
-        bottom_pipe_border = self.bottom_y_position
-        return top_pipe_border, bottom_pipe_border
-
-
-class Base:
-    def __init__(self):
-        self.image = pygame.image.load(os.path.join("images", "base.png"))
-        self.x_position = 0
-        self.y_position = WINDOW_HEIGHT - self.image.get_height()
-        self.velocity = 5 * SPEED
-
-    def draw(self, win):
-        win.blit(self.image, (self.x_position, self.y_position))
-
-
 class Game:
-    BACKGROUND_IMG = pygame.image.load(os.path.join("images", "background.png"))
+    # Game jedynie rysuje i steruje rozgrywką, cała logika gry znajduje się w FlappyEnv
 
-    def __init__(self, mode="manual", filename=None):
-        if mode != "manual" and mode != "train" and mode != "test":
+    def __init__(self, mode="manual", filename=None, headless=False, render_every=0, episodes=None, seed=None,
+                 pixel_collision=False, agent_options=None, profile_every=None, checkpoint_every=None, action_repeat=1,
+                 record=None, record_states=False, demo_traces=None, population=None, metrics_every=1000):
+        if mode != "manual" and mode != "train" and mode != "test" and mode != "population":
+            exit()
+        if mode == "population" and (not population or record is not None):
             exit()
         if mode == "test" and filename is None:
             exit()
+        if mode == "manual" and headless:
+            exit()
 
         self.mode = mode
+        # tryb headless: brak okna, rysowania i ograniczania liczby klatek,
+        # fizyka gry liczona tak szybko, jak pozwala procesor
+        # render_every > 0 - co który epizod ma być jednak wyświetlony (0 - żaden)
+        # episodes - liczba epizodów, po której gra się kończy (None - bez limitu)
+        self.headless = headless
+        self.render_every = render_every
+        self.episodes = episodes
         pygame.font.init()
-        self.window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.fish = Fish()
-        self.pipes = [Pipe(WINDOW_WIDTH)]
-        self.base = Base()
+        self.window = None
+        self.renderer = None
+        if not self.headless:
+            self.window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+            self.renderer = Renderer(self.window)
+        # pixel_collision - kolizje z rurami na maskach pikselowych pygame zamiast kształtów z flappy_env
+        pipe_collision = MaskCollision() if pixel_collision else None
+        if mode == "population":
+            # population - nazwy agentów z saved_agents/ (.npz z rozszerzeniem), każdy steruje jednym ptakiem,
+            # wszystkie ptaki lecą przez te same rury, decyzje żywych ptaków liczone są razem (PolicyStack)
+            self.env = PopulationEnv(len(population), seed, pipe_collision)
+        else:
+            self.env = FlappyEnv(seed, pipe_collision)
+        # profile_every - co ile kroków gry zapisywać do logu podsumowanie czasów faz (None - bez pomiarów)
+        self.profile_every = profile_every
+        self.profiler = Profiler() if profile_every else NULL_PROFILER
+        self.env.profiler = self.profiler
+        # action_repeat - agent decyduje co action_repeat klatek (skok tylko w pierwszej z nich),
+        # nagrody z tych klatek trafiają do bufora jako jedno przejście; klatki są nadal rysowane pojedynczo
+        # (AgentRunner z training.py, ten sam przebieg co w sweep.py)
+        self.action_repeat = action_repeat
+        self.frames_left = 0  # klatki pozostałe do następnej decyzji w trybie population
+        self.manual_action = 0  # skok gracza z handle_events, wykonywany w następnym kroku
         self.clock = pygame.time.Clock()
-        self.score = 0
         self.best_score = 0
         self.worst_score = float("inf")
         self.current_reward = 0
-        self.last_rewards = 0
         self.round_count = 0
 
-        self.last_time = pygame.time.get_ticks()
-        self.interval = 3250 / SPEED
         self.runs = True
         self.playing = True
 
         self.score_counter = 0
         self.round_counter = 0
-        self.games_history = []
+        self.games_history = ScoreStats()  # wyniki gier w trybie test, bez przechowywania i sortowania listy
 
         self.time = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
         self.filename = filename
@@ -154,52 +90,149 @@ class Game:
         if mode == "train" and self.filename is None:
             self.filename = "agent_" + self.time
 
-        if self.mode != "manual":
+        # log tekstowy i metryki (metrics.py) zapisywane partiami w tle, pliki otwierane raz na całą grę
+        # metryki: rekord po każdym epizodzie i co metrics_every kroków gry, historia jest tylko w pliku,
+        # tryb test pisze do osobnego pliku logs/metrics_<nazwa>_test.jsonl, żeby nie mieszać gier z treningiem
+        self.text_log = None
+        self.metrics = None
+        self.metrics_every = metrics_every
+        self.episode_steps = 0  # kroki gry w bieżącym epizodzie
+        self.total_steps = 0  # kroki gry od początku treningu, także sprzed wznowienia (z checkpointu)
+        self.episodes_before = 0  # epizody z treningów sprzed wznowienia, numeracja w metrykach jest ciągła
+        if self.filename is not None and mode in ("train", "test"):
+            self.text_log = TextLog("logs/log_" + self.filename + ".txt")
+            path = "logs/metrics_" + self.filename + ("_test" if mode == "test" else "") + ".jsonl"
+            # krzywe do save_graphs liczone są na bieżąco (Curve, ograniczona liczba punktów);
+            # przy wznowieniu treningu wcześniejsze epizody są raz odczytywane z pliku
+            self.reward_curve = Curve(20)
+            self.epsilon_curve = Curve(1)
+            if mode == "train" and os.path.exists(path):
+                for episode in read_metrics(path, "episode"):
+                    if "reward" in episode:
+                        self.reward_curve.add(episode["reward"])
+                        self.epsilon_curve.add(episode["epsilon"])
+            self.metrics = MetricsWriter(path)
+
+        # checkpoint_every - co ile epizodów zapisywać stan treningu (None - tylko na końcu)
+        self.checkpoint_every = checkpoint_every
+        self.checkpointer = None  # zapisy w tle, tworzone tylko w trybie train
+
+        if self.mode == "population":
+            self.train = False
+            self.population = population
+            # każdy agent wczytywany jest raz, ptaki z tym samym agentem liczone są razem jedną siecią
+            names = list(dict.fromkeys(population))
+            self.policies = PolicyStack([load_policy("saved_agents/" + name + ("" if name.endswith(".npz") else ".pt"))
+                                         for name in names])
+            self.bird_policies = np.array([names.index(name) for name in population])
+            self.population_history = [ScoreStats() for _ in population]
+        elif self.mode != "manual":
+            # Agent, checkpoint i torch wczytywane są dopiero tutaj, tryby manual i population działają bez torcha
+            from Agent_class import Agent
+            from checkpoint import AsyncCheckpointer, ReplayArchive
             self.train = self.mode == "train"
-            self.agent = Agent(4, 2)
+            if self.train:
+                self.checkpointer = AsyncCheckpointer()
+                self.replay_archive = ReplayArchive("training_agents/" + self.filename + "/replay")
+            # agent_options - dodatkowe ustawienia agenta, np. {"prioritized": True}
+            # seed gry ustala też wagi początkowe i eksplorację agenta
+            self.agent = Agent(4, 2, **{"seed": seed, **(agent_options or {})})
+            self.agent.profiler = self.profiler
+            self.runner = AgentRunner(self.agent, self.env, action_repeat, self.train)
+            self.runner.profiler = self.profiler
             self.load_agent()
-
-        self.previous_state = self.get_state()
-        self.previous_action = None
+            # demo_traces - plik z traces.py, którego gry trafiają do bufora pamięci przed treningiem
+            if self.train and demo_traces is not None:
+                count = fill_replay_buffer(self.agent.replay_buffer, demo_traces)
+                self.log(f"Loaded {count} transitions from {demo_traces}")
+
+        # record - plik, do którego zapisywane są rozegrane gry (traces.py), record_states - również stany i nagrody
+        # każda nagrywana gra dostaje własny seed (losowany z seed), żeby dało się ją później odtworzyć
+        self.recorder = None
+        if record is not None:
+            self.recorder = TraceRecorder(TraceWriter(record, record_states))
+            self.trace_seeds = random.Random(seed)
+            self.start_recording()
+
+        self.rendering = self.should_render()
+        if self.metrics is not None:
+            self.episode_loss = self.loss_mark()
+            self.start_metrics_window()
+
+    @property
+    def score(self):
+        return self.env.score
+
+    def should_render(self):
+        # czy bieżący epizod ma być rysowany w oknie
+        if not self.headless:
+            return True
+        return self.render_every > 0 and self.round_count % self.render_every == 0
 
     def get_state(self):
-        pipe = self.closestPipe()  # rura, która jest najbliżej, ale której nie minął agent
-        top, _ = pipe.get_borders()
-        return [
-            self.fish.y_position,  # wysokość agenta
-            self.fish.velocity,  # prędkość agenta
-            (pipe.x_position - self.fish.x_position) / SPEED,  # odległość między agenetem a najbliższą rurą
-            top - self.fish.y_position,  # różnica wysokości między agentem a dolną krawędzią górnej rury
-        ]
-        # górna krawędź dolnej rury się nie przyda, ponieważ jest to rzecz zależna od
-        # dolnej krawędzi górnej rury, jest to więc dwukrotnie przekazywana ta sama informacja
-
-    def closestPipe(self):
-        # funkcja ta zwraca najbliższą rurę, której agent jeszcze nie minął
-        # oryginalnie zwracała zawsze pierwszą rurę, lecz był krótki moment kiedy agent mijał
-        # pierwszą rurę i czekał aż ona zniknie z ekranu by dostać informacje o rurze przed sobą
-        # tu ten problem jest rozwiązany, w momencie w którym agent nie może zginąć przez 1 rurę,
-        # dostaje informacje o położeniu kolejnej
-        pipeWidth = self.pipes[0].upper_image.get_width()
-        for pipe in self.pipes:
-            if pipe.x_position - self.fish.x_position > -pipeWidth:
-                return pipe
-        return self.pipes[0]
+        return self.env.get_state()
+
+    def start_recording(self):
+        # nowa gra z własnym seedem, zwraca stan początkowy
+        episode_seed = self.trace_seeds.randrange(2 ** 62)
+        self.env.seed(episode_seed)
+        state = self.env.reset()
+        self.recorder.start(episode_seed, state)
+        return state
+
+    def loss_mark(self):
+        # stan licznika kosztów agenta, średni koszt od tego momentu zwraca mean_loss
+        return float(self.agent.loss_total), self.agent.loss_count
+
+    def mean_loss(self, mark):
+        total, count = self.loss_mark()
+        return (total - mark[0]) / (count - mark[1]) if count > mark[1] else None
+
+    def start_metrics_window(self):
+        self.window_time = time.perf_counter()
+        self.window_steps = self.total_steps
+        self.window_updates = self.agent.train_step_counter
+        self.window_loss = self.loss_mark()
+
+    def record_episode(self):
+        values = {"episode": self.episodes_before + self.round_count + 1, "score": self.score,
+                  "steps": self.episode_steps}
+        if self.train:
+            values.update(reward=self.current_reward, epsilon=self.agent.epsilon,
+                          loss=self.mean_loss(self.episode_loss))
+            self.episode_loss = self.loss_mark()
+            self.reward_curve.add(self.current_reward)
+            self.epsilon_curve.add(self.agent.epsilon)
+        self.metrics.record("episode", **values)
+
+    def record_steps(self):
+        elapsed = max(time.perf_counter() - self.window_time, 1e-9)
+        values = {"step": self.total_steps, "episode": self.episodes_before + self.round_count + 1,
+                  "steps_per_s": (self.total_steps - self.window_steps) / elapsed}
+        if self.train:
+            values.update(updates_per_s=(self.agent.train_step_counter - self.window_updates) / elapsed,
+                          loss=self.mean_loss(self.window_loss), epsilon=self.agent.epsilon,
+                          buffer=len(self.agent.replay_buffer))
+        self.metrics.record("steps", **values)
+        self.start_metrics_window()
 
     def restart(self):
         # restartowanie parametrów gry po zakończonym epizodzie
-        self.fish = Fish()
-        self.pipes.clear()
-        self.pipes.append(Pipe(WINDOW_WIDTH))
-        self.score = 0
-        self.last_time = pygame.time.get_ticks()
+        if self.metrics is not None:
+            self.record_episode()
+        self.episode_steps = 0
+        if self.recorder is not None:
+            self.recorder.finish(self.score)
+            self.start_recording()
+        else:
+            self.env.reset()
+        self.frames_left = 0
         self.playing = True
-        self.previous_state = self.get_state()
-        self.previous_action = None
         self.round_count += 1
+        self.rendering = self.should_render()
+        if self.mode != "manual" and self.mode != "population":
+            self.runner.end_episode()
         if self.mode != "manual" and self.train:
-            epsilon_per_game.append(self.agent.epsilon)
-            self.agent.update()
             global best_reward
             # sprawdzanie najlepszego wyniku i potencjalny zapis agenta
             if self.current_reward > best_reward:
@@ -208,24 +241,25 @@ class Game:
                 print("New best reward: " + str(best_reward) + "!")
                 self.save_agent()
 
-            self.last_rewards += self.current_reward
             self.current_reward = 0
 
-            if self.round_count % 20 == 0:
-                rewards_per_20_games.append(self.last_rewards / 20)
-                self.last_rewards = 0
+            if self.checkpoint_every and self.round_count % self.checkpoint_every == 0:
+                self.save_training_agent("Checkpoint saved")
 
     def handle_events(self):
         # obsługiwanie ruchów gracza
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.runs = False
+            # okno odsłonięte po zasłonięciu - przy rysowaniu tylko zmienionych prostokątów trzeba narysować całość
+            if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE) and self.renderer is not None:
+                self.renderer.invalidate()
 
             if self.mode == "manual":
                 if event.type == pygame.KEYDOWN:
                     if self.playing:
                         if event.key == pygame.K_SPACE:
-                            self.fish.jump()
+                            self.manual_action = 1
                     else:
                         if event.key == pygame.K_SPACE:
                             self.restart()
@@ -234,176 +268,167 @@ class Game:
 
     def step(self):
         # funkcja, która odpowiada za ruch postaci i rur w grze
-        if self.mode != "manual":
-            self.previous_state = self.get_state()
-            self.previous_action = self.agent.select_action(self.previous_state)
-            if self.previous_action == 1:
-                self.fish.jump()
-
-        self.fish.move()
-        self.handle_pipes()
-
-    def handle_pipes(self):
-        # funkcja, która usuwa niepotrzebne rury i dodaje nowe
-        current_time = pygame.time.get_ticks()
-
-        if self.pipes[-1].x_position < 10:
-            new_pipe = Pipe(WINDOW_WIDTH)
-            self.pipes.append(new_pipe)
-            self.last_time = current_time
-
-        to_remove = []
-        for pipe in self.pipes:
-            pipe.move()
-            if pipe.x_position + pipe.upper_image.get_width() < 0:
-                to_remove.append(pipe)
-
-        for pipe in to_remove:
-            self.pipes.remove(pipe)
-
-    def pipe_punishment(self, pipe):
-        # funkcja obliczająca karę za uderzenie w rurę
-        f_x, f_y = self.fish.x_position, self.fish.y_position + self.fish.image.get_height() / 2
-        p_x, p_y = pipe.x_position + pipe.upper_image.get_width(), pipe.get_borders()[0] + pipe.GAP / 2
-        return -5 + -5 * math.sqrt((f_x - p_x) ** 2 + (f_y - p_y) ** 2) / WINDOW_HEIGHT
-
-    def pipe_reward(self, pipe):
-        # funkcja obliczająca nagrodę za ominięcie rury
-        f_x, f_y = self.fish.x_position, self.fish.y_position + self.fish.image.get_height() / 2
-        p_x, p_y = pipe.x_position + pipe.upper_image.get_width(), pipe.get_borders()[0] + pipe.GAP / 2
-        center_offset = abs(f_y - p_y) / (WINDOW_HEIGHT / 2)  # Normalizacja
-        return 10 - 2 * center_offset + self.score  # Maks 5, minimum np. 3
-
-    def check_collision(self):
-        # funkcja sprawdzająca wszelkie kolizje z otoczeniem i rurami
-        # zwraca nagrodę na podstawie kolizji
-        if self.fish.check_base_collision(self.base) or self.fish.check_roof_collision():
-            self.playing = False
-            return -20
-
-        for pipe in self.pipes:
-            if self.fish.check_pipe_collision(pipe):
-                self.playing = False
-                return self.pipe_punishment(pipe)
-
-            if not pipe.passed and pipe.x_position + pipe.upper_image.get_width() < self.fish.x_position:
-                pipe.passed = True
-                self.score += 1
-                return self.pipe_reward(pipe)
-
-        return 0.1
+        # w trybie manualnym skok zgłaszany jest w handle_events
+        if self.mode == "population":
+            return self.population_step()
+        if self.mode == "manual":
+            action = self.manual_action
+            self.manual_action = 0
+            state, reward, done = self.env.step(action)
+        else:
+            # wybór akcji, krok gry, zapis do bufora i trening w AgentRunner
+            action, state, reward, done = self.runner.step()
+        if self.recorder is not None:
+            self.recorder.add(action, state, reward)
+        return state, reward, done
+
+    def population_step(self):
+        # akcje wszystkich żywych ptaków jednym wywołaniem PolicyStack, martwe ptaki stoją w miejscu
+        actions = np.zeros(self.env.size, dtype=np.int64)
+        if self.frames_left == 0:
+            alive = np.flatnonzero(self.env.alive)
+            start = self.profiler.time()
+            actions[alive] = self.policies(self.get_state()[alive], self.bird_policies[alive]).argmax(axis=1)
+            self.profiler.add("select_action", start)
+            self.frames_left = self.action_repeat
+        self.frames_left -= 1
+        return self.env.step(actions)
 
     def update(self):
         # funkcja aktualizująca stan gry
         if not self.playing:
             return
 
-        self.clock.tick(30 * SPEED)
+        if self.rendering:
+            start = self.profiler.time()
+            self.clock.tick(30 * SPEED)
+            self.profiler.add("clock_tick", start)
 
-        self.step()
-        reward = self.check_collision()
+        state, reward, done = self.step()
+        self.playing = self.env.playing
+        self.episode_steps += 1
+        self.total_steps += 1
 
         if self.mode != "manual" and self.train:
-            if self.previous_action is not None:
-                self.current_reward += reward
-                self.agent.replay_buffer.push(
-                    (self.previous_state,
-                     self.previous_action,
-                     self.get_state(),
-                     reward,
-                     not self.playing)
-                )
-                self.agent.train()
+            self.current_reward += reward
+
+        if self.profile_every:
+            self.profiler.count("steps")
+            if self.profiler.counts["steps"] >= self.profile_every:
+                self.log(self.profiler.summary())
+                self.profiler.reset()
+        if self.metrics is not None and self.total_steps % self.metrics_every == 0:
+            self.record_steps()
 
     def draw(self):
         # rysowanie okna
-        self.window.blit(BACKGROUND_IMG, (0, 0))
-        for pipe in self.pipes:
-            pipe.draw(self.window)
-        self.base.draw(self.window)
-        self.fish.draw(self.window)
-        font = pygame.font.SysFont("Arial", 32)
-        text_surface = font.render(f"Score: {self.score}", True, (255, 255, 255))
-        text = font.render(f"Score: {self.score}", True, (255, 255, 255))
-        self.window.blit(text, (WINDOW_WIDTH - 150, 30))
+        if not self.rendering:
+            return
+        if self.window is None:
+            # w trybie headless okno tworzymy dopiero przy pierwszym rysowanym epizodzie
+            self.window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+            self.renderer = Renderer(self.window)
+        start = self.profiler.time()
+        self.renderer.draw(self.env)
         # pygame.draw.line(self.window, (255, 0, 0), (0, 350), (WINDOW_WIDTH, 350), 2)
-        pygame.display.update()
+        self.profiler.add("draw", start)
 
     def save_agent(self):
         # zapisywanie najlepszego agenta
+        # zapis odbywa się w tle, gra toczy się dalej
         path = "saved_agents/" + self.filename + ".pt"
-        torch.save(self.agent.policy.state_dict(), path)
+        self.checkpointer.save(self.agent.policy.state_dict(), path)
         self.log("Agent saved")
 
-    def save_training_agent(self):
+    def save_training_agent(self, message="End of training"):
         # zapisywanie agenta do potencjalnego dalszego treningu
-        path = "training_agents/" + self.filename + ".pt"
+        # training_agents/<nazwa>/model.pt - sieci i optymalizator (zapisywane w tle),
+        # training_agents/<nazwa>/replay - bufor pamięci, dopisywane są tylko nowe przejścia
+        path = "training_agents/" + self.filename + "/model.pt"
         global best_reward
-        global rewards_per_20_games
-        global epsilon_per_game
-        torch.save({
+        self.checkpointer.save({
             'policy_state_dict': self.agent.policy.state_dict(),
             'target_state_dict': self.agent.target.state_dict(),
             'optimizer_state_dict': self.agent.optimizer.state_dict(),
             'epsilon': self.agent.epsilon,
-            'replay_buffer': self.agent.replay_buffer,
             'episode': self.agent.train_step_counter,
             'best_reward': best_reward,
-            'rewards_history': rewards_per_20_games,
-            'epsilon_history': epsilon_per_game
+            'episodes': self.episodes_before + self.round_count,
+            'total_steps': self.total_steps
         }, path)
-        self.log("End of training")
+        # ReplayArchive.save pisze do tych samych plików, które poprzedni flush może jeszcze zapisywać w tle,
+        # więc najpierw czekamy - inaczej na dysku mogłyby być dane nowszego zapisu z meta.json starszego
+        self.checkpointer.wait()
+        self.checkpointer.submit(self.replay_archive.save(self.agent.replay_buffer))
+        self.log(message)
 
     def load_agent(self):
         # wczytywanie agenta do dalszego treningu
         # lub do testowania
+        import torch
         if self.train:
             self.log("Start of training")
-            path = "training_agents/" + self.filename + ".pt"
+            path = "training_agents/" + self.filename + "/model.pt"
+            legacy_path = "training_agents/" + self.filename + ".pt"  # dawny format z całym buforem w pliku
+            checkpoint = None
             if os.path.exists(path):
-                checkpoint = torch.load(path, weights_only=False)
+                checkpoint = torch.load(path, weights_only=True)
+                if not self.replay_archive.load(self.agent.replay_buffer):
+                    # brak meta.json albo inna pojemność bufora - sieci i epsilon są wczytywane, bufor nie
+                    message = "Replay archive missing or incompatible, resuming with an empty replay buffer"
+                    print(message)
+                    self.log(message)
+            elif os.path.exists(legacy_path):
+                checkpoint = torch.load(legacy_path, weights_only=False)
+                for transition in checkpoint['replay_buffer'].buffer:
+                    self.agent.replay_buffer.push(transition)
+            if checkpoint is not None:
+                # historia nagród i epsilonu z dawnych checkpointów jest pomijana, teraz jest w pliku metryk
                 global best_reward
-                global rewards_per_20_games
-                global epsilon_per_game
                 self.agent.policy.load_state_dict(checkpoint['policy_state_dict'])
                 self.agent.target.load_state_dict(checkpoint['target_state_dict'])
                 self.agent.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
                 self.agent.epsilon = checkpoint['epsilon']
-                self.agent.replay_buffer = checkpoint['replay_buffer']
                 self.agent.train_step_counter = checkpoint['episode']
                 best_reward = checkpoint['best_reward']
-                rewards_per_20_games = checkpoint['rewards_history']
-                epsilon_per_game = checkpoint['epsilon_history']
+                # starsze checkpointy nie mają liczników, numeracja zaczyna się wtedy od zera
+                self.episodes_before = checkpoint.get('episodes', 0)
+                self.total_steps = checkpoint.get('total_steps', 0)
+                if self.agent.prioritized:
+                    self.agent.replay_buffer.reset_priorities()
         else:
             path = "saved_agents/" + self.filename + ".pt"
             self.agent.policy.load_state_dict(torch.load(path))
             self.agent.epsilon = 0
 
     def log(self, message):
-        path = "logs/log_" + self.filename + ".txt"
-        time_str = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-        with open(path, "a") as f:
-            f.write(f"{time_str} {message}\n")
+        # bez pliku logu (tryby manual i population) wiadomości trafiają na ekran
+        if self.text_log is None:
+            print(message)
+            return
+        self.text_log.log(message)
 
     def save_graphs(self):
         # zapisywanie wykresów z treningu
+        # krzywe obejmują też wcześniejsze, wznowione treningi z tego samego pliku metryk
         self.save_training_agent()
-        plt.plot([(i+1)*20 for i in range(len(rewards_per_20_games))], rewards_per_20_games)
+        plt.plot(self.reward_curve.episodes(), self.reward_curve.points)
         plt.ylabel('Średnie nagrody')
         plt.xlabel('Nr epizodu')
         plt.title("Wykres średnich nagród względem liczby epizodów")
         plt.savefig('graphs/rewards_' + self.filename + '.png')
 
         plt.figure()
-        plt.plot(epsilon_per_game)
+        plt.plot(self.epsilon_curve.episodes(), self.epsilon_curve.points)
         plt.ylabel('Epsilon')
         plt.xlabel('Nr epizodu')
         plt.title("Wykres wartości współczynnika eksploracji w trakcie treningu")
         plt.savefig('graphs/epsilon_' + self.filename + '.png')
 
     def game_loop(self):
-        self.last_time = pygame.time.get_ticks()
         global best_reward
+        # pomiary od początku pętli gry, bez tworzenia agenta i wczytywania checkpointu, bufora czy demo
+        self.profiler.reset()
         if self.mode == "manual":
             while self.runs:
                 self.handle_events()
@@ -411,34 +436,61 @@ class Game:
                     self.update()
                     self.draw()
         else:
-            while self.runs:
-                if self.train and self.round_counter == 20:
-                    print("Average score: " + str(self.score_counter / 20))
-                    self.round_counter = 0
-                    self.score_counter = 0
-
-                if not self.playing:
-                    self.score_counter += self.score
-                    self.round_counter += 1
-                    self.best_score = max(self.best_score, self.score)
-                    self.worst_score = min(self.worst_score, self.score)
-                    if not self.train:
-                        self.games_history.append(self.score)
-                        self.games_history = sorted(self.games_history)
-                        print(f"{self.round_counter}. Average: {self.score_counter / self.round_counter:.2f}, Median: "
-                              f"{median(self.games_history)}, Range: {self.worst_score} - {self.best_score}")
-                    self.restart()
+            # w trybie headless jedynym sposobem na przerwanie treningu jest Ctrl+C,
+            # wtedy również chcemy zapisać agenta i wykresy
+            try:
+                while self.runs:
+                    if self.train and self.round_counter == 20:
+                        print("Average score: " + str(self.score_counter / 20))
+                        self.round_counter = 0
+                        self.score_counter = 0
+
+                    if not self.playing:
+                        self.score_counter += self.score
+                        self.round_counter += 1
+                        self.best_score = max(self.best_score, self.score)
+                        self.worst_score = min(self.worst_score, self.score)
+                        if self.mode == "population":
+                            for stats, score in zip(self.population_history, self.env.scores):
+                                stats.add(int(score))
+                            print(f"{self.round_counter}. " + ", ".join(
+                                f"{name}: {score} (average {stats.mean:.2f})"
+                                for name, score, stats in zip(self.population, self.env.scores,
+                                                              self.population_history)))
+                        elif not self.train:
+                            self.games_history.add(self.score)
+                            print(f"{self.round_counter}. Average: {self.score_counter / self.round_counter:.2f}, "
+                                  f"Median: {self.games_history.median():g}, "
+                                  f"Range: {self.worst_score} - {self.best_score}")
+                        self.restart()
+                        if self.episodes is not None and self.round_count >= self.episodes:
+                            self.runs = False
+                            break
 
-                self.handle_events()
-                self.update()
-                self.draw()
+                    # zdarzenia obsługujemy tylko gdy istnieje okno
+                    if self.window is not None:
+                        self.handle_events()
+                    self.update()
+                    self.draw()
+            except KeyboardInterrupt:
+                self.runs = False
 
         pygame.quit()
+        if self.recorder is not None:
+            self.recorder.finish(self.score, finished=not self.playing)
+            self.recorder.writer.close()
         if self.mode != 'manual' and self.train:
             self.save_graphs()
+        if self.checkpointer is not None:
+            self.checkpointer.wait()
+        for writer in (self.text_log, self.metrics):
+            if writer is not None:
+                writer.close()
 
 
 if __name__ == "__main__":
-    # 3 możliwe tryby: manual, train, test
+    # 4 możliwe tryby: manual, train, test, population
+    # trening bez okna: Game(mode="train", headless=True, render_every=100)
+    # kilku agentów na tych samych rurach: Game(mode="population", population=["bestAgent", "1hour"])
     game = Game(mode="test", filename="1hour")
     game.game_loop()
@@ -0,0 +1,267 @@
+import math
+import random
+
+import numpy as np
+
+from profiler import NULL_PROFILER
+
+# środowisko gry bez pygame: fizyka, rury, nagrody i stan dla agenta
+# Game w flappy_bird.py jedynie rysuje to, co dzieje się tutaj
+
+WINDOW_HEIGHT = 750
+WINDOW_WIDTH = 550
+SPEED = 2
+JUMP = 18
+
+# wymiary obrazków z katalogu images
+FISH_WIDTH = 115
+FISH_HEIGHT = 90
+PIPE_WIDTH = 165
+PIPE_HEIGHT = 750
+BASE_HEIGHT = 120
+
+# nieprzezroczyste piksele obrazków opisane prostokątami (góra, dół, lewo, prawo), włącznie
+# sprite'y są rysowane blokami, więc kilka prostokątów wystarcza; pokrywają maskę z pygame.mask
+# nadmiarowo tylko wewnątrz sylwetki (wypełniają dziury w środku ptaka: 7125 pikseli zamiast 6975),
+# kolizje z rurami dają przy tym te same wyniki co maska (sprawdza to check_collision.py)
+FISH_SHAPE = (
+    (0, 4, 45, 64),
+    (5, 9, 45, 69),
+    (10, 14, 50, 74),
+    (15, 19, 45, 84),
+    (20, 24, 35, 94),
+    (25, 29, 5, 99),
+    (30, 34, 0, 99),
+    (35, 44, 0, 104),
+    (45, 49, 5, 104),
+    (50, 54, 10, 104),
+    (55, 59, 5, 109),
+    (60, 74, 0, 114),
+    (75, 79, 5, 109),
+    (80, 84, 35, 94),
+    (85, 89, 45, 84),
+)
+BOTTOM_PIPE_SHAPE = (
+    (0, 34, 15, 139),
+    (35, 49, 20, 134),
+    (50, 749, 25, 129),
+)
+# górna rura to odbita w pionie dolna
+UPPER_PIPE_SHAPE = tuple((PIPE_HEIGHT - 1 - bottom, PIPE_HEIGHT - 1 - top, left, right)
+                         for top, bottom, left, right in BOTTOM_PIPE_SHAPE)
+
+
+def bounding_box(shape):
+    # najmniejszy prostokąt obejmujący cały kształt
+    return (min(rect[0] for rect in shape), max(rect[1] for rect in shape),
+            min(rect[2] for rect in shape), max(rect[3] for rect in shape))
+
+
+FISH_BOX = bounding_box(FISH_SHAPE)
+UPPER_PIPE_BOX = bounding_box(UPPER_PIPE_SHAPE)
+BOTTOM_PIPE_BOX = bounding_box(BOTTOM_PIPE_SHAPE)
+
+
+def boxes_overlap(box_a, box_b, offset):
+    # czy prostokąty ograniczające nachodzą na siebie, box_b przesunięty o offset względem box_a
+    dx, dy = offset
+    return (max(box_a[0], box_b[0] + dy) <= min(box_a[1], box_b[1] + dy)
+            and max(box_a[2], box_b[2] + dx) <= min(box_a[3], box_b[3] + dx))
+
+
+def shapes_overlap(shape_a, shape_b, offset):
+    # odpowiednik mask_a.overlap(mask_b, offset) dla kształtów opisanych prostokątami
+    dx, dy = offset
+    for a_top, a_bottom, a_left, a_right in shape_a:
+        for b_top, b_bottom, b_left, b_right in shape_b:
+            if (max(a_top, b_top + dy) <= min(a_bottom, b_bottom + dy)
+                    and max(a_left, b_left + dx) <= min(a_right, b_right + dx)):
+                return True
+    return False
+
+
+class Fish:
+    def __init__(self):
+        self.x_position = 50
+        self.y_position = WINDOW_HEIGHT / 3
+        self.jump_velocity = -JUMP
+        self.velocity = self.jump_velocity
+        self.acceleration = 2
+
+    def jump(self):
+        self.velocity = self.jump_velocity
+
+    def move(self):
+        self.y_position += self.velocity
+        self.velocity += self.acceleration
+
+        if self.velocity >= 20:
+            self.velocity = 20
+
+    def check_base_collision(self):
+        return self.y_position + FISH_HEIGHT >= WINDOW_HEIGHT - BASE_HEIGHT
+
+    def check_pipe_collision(self, pipe):
+        # najpierw tanie sprawdzenie prostokątów ograniczających,
+        # dokładny kształt porównujemy tylko gdy te na siebie nachodzą
+        upper_offset = (pipe.x_position - self.x_position, pipe.upper_y_position - self.y_position)
+        bottom_offset = (pipe.x_position - self.x_position, pipe.bottom_y_position - self.y_position)
+        return ((boxes_overlap(FISH_BOX, UPPER_PIPE_BOX, upper_offset)
+                 and shapes_overlap(FISH_SHAPE, UPPER_PIPE_SHAPE, upper_offset))
+                or (boxes_overlap(FISH_BOX, BOTTOM_PIPE_BOX, bottom_offset)
+                    and shapes_overlap(FISH_SHAPE, BOTTOM_PIPE_SHAPE, bottom_offset)))
+
+    def check_roof_collision(self):
+        return self.y_position <= 0
+
+
+class Pipe:
+    GAP = 250
+    UPPER_LIMIT = 50  # górna granica ograniczająca pozycję rury
+    BOTTOM_LIMIT = 320  # dolna granica
+
+    def __init__(self, x, rng=random):
+        self.x_position = x
+        self.upper_y_position = rng.randint(Pipe.UPPER_LIMIT - PIPE_HEIGHT, Pipe.BOTTOM_LIMIT - PIPE_HEIGHT)
+        self.bottom_y_position = self.upper_y_position + Pipe.GAP + PIPE_HEIGHT
+        self.velocity = 5 * SPEED
+        self.passed = False
+
+    def move(self):
+        self.x_position -= self.velocity
+
+    def get_borders(self):
+        top_pipe_border = self.upper_y_position + PIPE_HEIGHT
+        bottom_pipe_border = self.bottom_y_position
+        return top_pipe_border, bottom_pipe_border
+
+
+class FlappyEnv:
+    def __init__(self, seed=None, pipe_collision=None, action_repeat=1):
+        # każde środowisko ma własny generator liczb losowych,
+        # ten sam seed daje ten sam układ rur
+        self.random = random.Random(seed)
+        # pipe_collision(fish, pipe) pozwala podmienić sprawdzanie kolizji z rurą,
+        # np. na maski pikselowe z pygame (assets.MaskCollision), domyślnie Fish.check_pipe_collision
+        self.pipe_collision = pipe_collision or Fish.check_pipe_collision
+        self.profiler = NULL_PROFILER  # pomiary czasu fizyki i kolizji (profiler.Profiler)
+        # action_repeat - liczba klatek gry na jeden krok (jedną decyzję agenta)
+        self.action_repeat = action_repeat
+        self.fish = None
+        self.pipes = []
+        self.score = 0
+        self.playing = True
+        self.reset()
+
+    def seed(self, seed):
+        self.random.seed(seed)
+
+    def reset(self):
+        # rozpoczęcie nowego epizodu, zwraca stan początkowy
+        self.fish = Fish()
+        self.pipes = [Pipe(WINDOW_WIDTH, self.random)]
+        self.score = 0
+        self.playing = True
+        return self.get_state()
+
+    def step(self, action):
+        # jeden krok agenta: action_repeat klatek gry, nagrody z klatek są sumowane
+        # skok (1) wykonywany jest tylko w pierwszej klatce - powtarzany co klatkę nie pozwalałby opadać
+        # zwraca (stan, nagroda, czy koniec epizodu)
+        reward = self.frame(action)
+        for _ in range(self.action_repeat - 1):
+            if not self.playing:
+                break
+            reward += self.frame(0)
+        return self.get_state(), reward, not self.playing
+
+    def frame(self, action):
+        # jedna klatka gry: akcja agenta (1 - skok), ruch postaci i rur, kolizje, zwraca nagrodę
+        start = self.profiler.time()
+        if action == 1:
+            self.fish.jump()
+        self.fish.move()
+        self.handle_pipes()
+        self.profiler.add("physics", start)
+        start = self.profiler.time()
+        reward = self.check_collision()
+        self.profiler.add("check_collision", start)
+        return reward
+
+    def living_fish(self):
+        # ptaki do narysowania
+        return [self.fish]
+
+    def get_state(self):
+        pipe = self.closest_pipe()  # rura, która jest najbliżej, ale której nie minął agent
+        top, _ = pipe.get_borders()
+        return [
+            self.fish.y_position,  # wysokość agenta
+            self.fish.velocity,  # prędkość agenta
+            (pipe.x_position - self.fish.x_position) / SPEED,  # odległość między agenetem a najbliższą rurą
+            top - self.fish.y_position,  # różnica wysokości między agentem a dolną krawędzią górnej rury
+        ]
+        # górna krawędź dolnej rury się nie przyda, ponieważ jest to rzecz zależna od
+        # dolnej krawędzi górnej rury, jest to więc dwukrotnie przekazywana ta sama informacja
+
+    def closest_pipe(self):
+        # funkcja ta zwraca najbliższą rurę, której agent jeszcze nie minął
+        # oryginalnie zwracała zawsze pierwszą rurę, lecz był krótki moment kiedy agent mijał
+        # pierwszą rurę i czekał aż ona zniknie z ekranu by dostać informacje o rurze przed sobą
+        # tu ten problem jest rozwiązany, w momencie w którym agent nie może zginąć przez 1 rurę,
+        # dostaje informacje o położeniu kolejnej
+        for pipe in self.pipes:
+            if pipe.x_position - self.fish.x_position > -PIPE_WIDTH:
+                return pipe
+        return self.pipes[0]
+
+    def handle_pipes(self):
+        # usuwanie niepotrzebnych rur i dodawanie nowych
+        if self.pipes[-1].x_position < 10:
+            self.pipes.append(Pipe(WINDOW_WIDTH, self.random))
+
+        for pipe in self.pipes:
+            pipe.move()
+        self.pipes = [pipe for pipe in self.pipes if pipe.x_position + PIPE_WIDTH >= 0]
+
+    def pipe_punishment(self, pipe, fish=None):
+        # kara za uderzenie w rurę, fish - inny ptak niż self.fish (PopulationEnv)
+        fish = fish or self.fish
+        f_x, f_y = fish.x_position, fish.y_position + FISH_HEIGHT / 2
+        p_x, p_y = pipe.x_position + PIPE_WIDTH, pipe.get_borders()[0] + pipe.GAP / 2
+        return -5 + -5 * math.sqrt((f_x - p_x) ** 2 + (f_y - p_y) ** 2) / WINDOW_HEIGHT
+
+    def pipe_reward(self, pipe, fish=None, score=None):
+        # nagroda za ominięcie rury, fish i score - inny ptak i jego wynik (PopulationEnv)
+        fish = fish or self.fish
+        score = self.score if score is None else score
+        f_x, f_y = fish.x_position, fish.y_position + FISH_HEIGHT / 2
+        p_x, p_y = pipe.x_position + PIPE_WIDTH, pipe.get_borders()[0] + pipe.GAP / 2
+        center_offset = abs(f_y - p_y) / (WINDOW_HEIGHT / 2)  # Normalizacja
+        return 10 - 2 * center_offset + score  # Maks 5, minimum np. 3
+
+    def check_collision(self):
+        # sprawdzanie wszelkich kolizji z otoczeniem i rurami
+        # zwraca nagrodę na podstawie kolizji
+        if self.fish.check_base_collision() or self.fish.check_roof_collision():
+            self.playing = False
+            return -20
+
+        for pipe in self.pipes:
+            if self.pipe_collision(self.fish, pipe):
+                self.playing = False
+                return self.pipe_punishment(pipe)
+
+            if not pipe.passed and pipe.x_position + PIPE_WIDTH < self.fish.x_position:
+                pipe.passed = True
+                self.score += 1
+                return self.pipe_reward(pipe)
+
+        return 0.1
+
+
+def pipe_layout(seed, count):
+    # położenia (upper_y_position) pierwszych count rur w grze FlappyEnv(seed), bez symulowania gry
+    # rury zależą wyłącznie od seeda, a nie od ruchów agenta, więc układ można policzyć z góry
+    rng = random.Random(seed)
+    return np.array([Pipe(WINDOW_WIDTH, rng).upper_y_position for _ in range(count)], dtype=np.int64)
@@ -0,0 +1,225 @@
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# zapis przebiegu treningu bez narzutu na grę:
+# - LineWriter trzyma plik otwarty i dopisuje zebrane linie partiami z osobnego wątku (co flush_interval sekund)
+# - MetricsWriter zapisuje rekordy jako JSONL, jeden obiekt JSON na linię, np.
+#   {"type": "episode", "time": ..., "episode": 120, "score": 3, "reward": 41.2, "epsilon": 0.54, "loss": 0.8}
+#   {"type": "steps", "time": ..., "step": 50000, "steps_per_s": 2100.5, "updates_per_s": 2100.5, "loss": 0.7}
+# plik jest tylko dopisywany, więc można go czytać w trakcie treningu, a po wznowieniu treningu historia trwa dalej
+# podgląd na żywo: python metrics.py tail logs/metrics_<nazwa>.jsonl
+#                  python metrics.py plot logs/metrics_<nazwa>.jsonl --follow
+
+
+class LineWriter:
+    def __init__(self, path, flush_interval=1.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a")
+        self.flush_interval = flush_interval
+        self.pending = []  # linie czekające na zapis
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)  # resztka bufora trafia do pliku także przy wyjściu bez close()
+
+    def work(self):
+        while not self.closed.wait(self.flush_interval):
+            self.flush()
+
+    def write(self, line):
+        # samo dodanie do listy, plik zapisuje wątek w tle
+        with self.lock:
+            self.pending.append(line)
+
+    def flush(self):
+        # zapis wszystkich oczekujących linii jednym write
+        with self.lock:
+            lines, self.pending = self.pending, []
+            if lines and not self.file.closed:
+                self.file.write("\n".join(lines) + "\n")
+                self.file.flush()
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self.thread.join()
+        self.flush()
+        self.file.close()
+
+
+class TextLog(LineWriter):
+    # log tekstowy z datą przy każdej wiadomości, w formacie dawnego Game.log
+    def log(self, message):
+        time_str = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
+        self.write(f"{time_str} {message}")
+
+
+class MetricsWriter(LineWriter):
+    def record(self, kind, **values):
+        self.write(json.dumps({"type": kind, "time": round(time.time(), 3), **values}))
+
+
+class Curve:
+    # krzywa do wykresu o ograniczonej liczbie punktów, liczona na bieżąco bez trzymania historii:
+    # punkty to średnie z kolejnych okien po window wartości, a gdy punktów jest więcej niż max_points,
+    # sąsiednie punkty są łączone, a okno podwajane
+    def __init__(self, window=1, max_points=1000):
+        self.window = window
+        self.max_points = max_points
+        self.points = []
+        self.total = 0.0  # suma i liczba wartości w bieżącym, niepełnym oknie
+        self.count = 0
+
+    def add(self, value):
+        self.total += value
+        self.count += 1
+        if self.count < self.window:
+            return
+        self.points.append(self.total / self.window)
+        self.total = 0.0
+        self.count = 0
+        if len(self.points) > self.max_points:
+            if len(self.points) % 2:
+                # nieparzysty ostatni punkt staje się początkiem nowego, dwa razy dłuższego okna
+                self.total = self.points.pop() * self.window
+                self.count = self.window
+            self.points = [(a + b) / 2 for a, b in zip(self.points[::2], self.points[1::2])]
+            self.window *= 2
+
+    def episodes(self):
+        # numer ostatniej wartości w każdym punkcie
+        return [(i + 1) * self.window for i in range(len(self.points))]
+
+
+def read_metrics(path, kind=None):
+    # kolejne rekordy z pliku (tylko typu kind, jeżeli podany), niedokończona ostatnia linia jest pomijana
+    with open(path) as f:
+        for line in f:
+            if not line.endswith("\n"):
+                return
+            record = json.loads(line)
+            if kind is None or record["type"] == kind:
+                yield record
+
+
+def moving_average(values, window):
+    # średnia z ostatnich window wartości dla każdego punktu
+    recent = deque(maxlen=window)
+    total = 0.0
+    averages = []
+    for value in values:
+        if len(recent) == window:
+            total -= recent[0]
+        recent.append(value)
+        total += value
+        averages.append(total / len(recent))
+    return averages
+
+
+def format_record(record):
+    values = ", ".join(f"{key}: {value:.4g}" if isinstance(value, float) else f"{key}: {value}"
+                       for key, value in record.items() if key not in ("type", "time"))
+    time_str = datetime.fromtimestamp(record["time"]).strftime("%H:%M:%S")
+    return f"[{time_str}] {record['type']:8} {values}"
+
+
+def tail(path, lines=10, interval=1.0):
+    # ostatnie rekordy z pliku, potem nowe w miarę dopisywania (jak tail -f), przerwanie Ctrl+C
+    with open(path) as f:
+        last = deque(f, maxlen=lines)
+        partial = last.pop() if last and not last[-1].endswith("\n") else ""
+        for line in last:
+            print(format_record(json.loads(line)))
+        try:
+            while True:
+                line = f.readline()
+                if not line:
+                    time.sleep(interval)
+                    continue
+                partial += line
+                if partial.endswith("\n"):
+                    print(format_record(json.loads(partial)))
+                    partial = ""
+        except KeyboardInterrupt:
+            pass
+
+
+def plot(path, window=20, follow=False, interval=5.0, output=None):
+    # wykresy nagród i wyników (średnia z window epizodów), epsilonu oraz kosztu i szybkości treningu
+    # follow - wykres odświeżany co interval sekund, dopóki okno jest otwarte
+    import matplotlib.pyplot as plt
+
+    figure, axes = plt.subplots(2, 2, figsize=(12, 8))
+    speed = axes[1, 1].twinx()
+    while True:
+        records = list(read_metrics(path))
+        episodes = [record for record in records if record["type"] == "episode"]
+        steps = [record for record in records if record["type"] == "steps"]
+        for ax in [*axes.flat, speed]:
+            ax.clear()
+        # epizody numerowane w całym pliku, bo pliki sprzed zapisu liczników w checkpoincie
+        # (albo bez checkpointu) zaczynają numerację od nowa po każdym uruchomieniu
+        numbers = range(1, len(episodes) + 1)
+        if episodes and "reward" in episodes[0]:
+            axes[0, 0].plot(numbers, moving_average([record["reward"] for record in episodes], window))
+        axes[0, 0].set_title(f"Reward (average of {window} episodes)")
+        axes[0, 1].plot(numbers, moving_average([record["score"] for record in episodes], window))
+        axes[0, 1].set_title(f"Score (average of {window} episodes)")
+        if episodes and "epsilon" in episodes[0]:
+            axes[1, 0].plot(numbers, [record["epsilon"] for record in episodes])
+        axes[1, 0].set_title("Epsilon")
+        axes[1, 0].set_xlabel("Episode")
+        # tak samo kroki: gdy numeracja zaczyna się od nowa, dalsze rekordy są przesuwane za ostatni krok
+        offset = last = 0
+        step_numbers = []
+        for record in steps:
+            if record["step"] + offset < last:
+                offset = last
+            last = record["step"] + offset
+            step_numbers.append(last)
+        losses = [(step, record["loss"]) for step, record in zip(step_numbers, steps) if record.get("loss") is not None]
+        if losses:
+            axes[1, 1].plot(*zip(*losses), color="tab:red")
+        axes[1, 1].set_title("Loss")
+        axes[1, 1].set_xlabel("Step")
+        if steps:
+            speed.plot(step_numbers, [record["steps_per_s"] for record in steps], alpha=0.5)
+            speed.set_ylabel("Steps/s")
+            speed.yaxis.set_label_position("right")
+        figure.tight_layout()
+        if output is not None:
+            figure.savefig(output)
+        if not follow:
+            break
+        plt.pause(interval)
+        if not plt.fignum_exists(figure.number):
+            break
+    if output is None and not follow:
+        plt.show()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a metrics file written during training")
+    parser.add_argument("command", choices=["tail", "plot"])
+    parser.add_argument("path", help="e.g. logs/metrics_<name>.jsonl")
+    parser.add_argument("--lines", type=int, default=10, help="records shown before following the file (tail)")
+    parser.add_argument("--window", type=int, default=20, help="episodes per moving average (plot)")
+    parser.add_argument("--follow", action="store_true", help="keep refreshing the plot as the file grows")
+    parser.add_argument("--interval", type=float, default=None, help="seconds between refreshes")
+    parser.add_argument("--output", default=None, help="save the plot to this file instead of showing it")
+    args = parser.parse_args()
+
+    if args.command == "tail":
+        tail(args.path, args.lines, args.interval or 1.0)
+    else:
+        plot(args.path, args.window, args.follow, args.interval or 5.0, args.output)
@@ -0,0 +1,124 @@
+import numpy as np
+
+# sieć DQN liczona w czystym NumPy, moduł nie importuje torcha,
+# więc wyeksportowanych agentów (export.py) można uruchamiać bez kosztu jego wczytania
+
+LAYERS = ("fc1", "fc2", "value")
+
+
+class NumpyDQN:
+    # forward pass DQN w czystym NumPy, dla pojedynczych stanów dużo szybszy niż nn.Module
+    # from_module na CPU nie kopiuje wag - tablice są widokami na parametry sieci,
+    # więc po każdym kroku optymalizatora od razu widzą nowe wartości
+    # load/save - pliki .npz z export.py, wczytywane bez torcha
+    # wagi int8 zostają w pamięci jako int8 (4 razy mniej niż float32), skala każdego neuronu mnożona jest
+    # dopiero przez wynik warstwy: x @ (W * s) == (x @ W) * s
+
+    def __init__(self, fc1_weight, fc1_bias, fc2_weight, fc2_bias, value_weight=None, value_bias=None, scales=None):
+        # scales - {nazwa warstwy: skala każdego neuronu} dla warstw z wagami int8
+        scales = scales or {}
+        self.fc1_weight = fc1_weight.T
+        self.fc1_bias = fc1_bias
+        self.fc1_scale = scales.get("fc1")
+        self.fc2_weight = fc2_weight.T
+        self.fc2_bias = fc2_bias
+        self.fc2_scale = scales.get("fc2")
+        self.value_weight = None if value_weight is None else value_weight.T  # tylko sieć dueling
+        self.value_bias = value_bias
+        self.value_scale = scales.get("value")
+
+    @classmethod
+    def from_module(cls, module):
+        return cls.from_state_dict(module.state_dict())
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        names = ["fc1.weight", "fc1.bias", "fc2.weight", "fc2.bias"]
+        if "value.weight" in state_dict:
+            names += ["value.weight", "value.bias"]
+        return cls(*(state_dict[name].detach().cpu().numpy() for name in names))
+
+    @classmethod
+    def load(cls, path):
+        arrays = []
+        scales = {}
+        with np.load(path) as data:
+            for layer in LAYERS:
+                if layer + "_weight" not in data:
+                    continue
+                arrays += [data[layer + "_weight"], data[layer + "_bias"]]
+                if layer + "_scale" in data:
+                    scales[layer] = data[layer + "_scale"]
+        return cls(*arrays, scales=scales)
+
+    def stored_layers(self):
+        # (nazwa, waga w układzie nn.Linear (wyjścia, wejścia), bias, skala albo None) - tak jak w pamięci
+        layers = [("fc1", self.fc1_weight.T, self.fc1_bias, self.fc1_scale),
+                  ("fc2", self.fc2_weight.T, self.fc2_bias, self.fc2_scale)]
+        if self.value_weight is not None:
+            layers.append(("value", self.value_weight.T, self.value_bias, self.value_scale))
+        return layers
+
+    def layers(self):
+        # (nazwa, waga float32 w układzie nn.Linear (wyjścia, wejścia), bias), wagi int8 przeliczone przez skalę
+        return [(name, weight if scale is None else weight.astype(np.float32) * scale[:, None], bias)
+                for name, weight, bias, scale in self.stored_layers()]
+
+    def save(self, path, quantize=False):
+        # quantize - wagi int8 z osobną skalą dla każdego neuronu (wiersza), biasy zostają float32
+        arrays = {}
+        for name, weight, bias in self.layers():
+            if quantize:
+                scale = np.abs(weight).max(axis=1) / 127
+                scale[scale == 0] = 1
+                arrays[name + "_weight"] = np.round(weight / scale[:, None]).astype(np.int8)
+                arrays[name + "_scale"] = scale.astype(np.float32)
+            else:
+                arrays[name + "_weight"] = weight.astype(np.float32)
+            arrays[name + "_bias"] = bias.astype(np.float32)
+        np.savez(path, **arrays)
+
+    def nbytes(self):
+        # pamięć zajmowana przez wagi w obecnej postaci (int8 ze skalami albo float32)
+        return sum(weight.nbytes + bias.nbytes + (0 if scale is None else scale.nbytes)
+                   for _, weight, bias, scale in self.stored_layers())
+
+    def __call__(self, x):
+        # x: pojedynczy stan (input_dim,) lub wiele stanów (n, input_dim)
+        hidden = linear(x, self.fc1_weight, self.fc1_bias, self.fc1_scale)
+        np.maximum(hidden, 0, out=hidden)
+        if self.value_weight is None:
+            return linear(hidden, self.fc2_weight, self.fc2_bias, self.fc2_scale)
+        advantages = linear(hidden, self.fc2_weight, self.fc2_bias, self.fc2_scale)
+        value = linear(hidden, self.value_weight, self.value_bias, self.value_scale)
+        return value + advantages - advantages.mean(-1, keepdims=True)
+
+
+def linear(x, weight, bias, scale=None):
+    # warstwa x @ weight + bias, dla wag int8 wynik mnożenia przeliczany jest przez skalę neuronów
+    output = x @ weight
+    if scale is not None:
+        output *= scale
+    output += bias
+    return output
+
+
+class PolicyStack:
+    # wiele sieci NumpyDQN liczonych naraz, np. dla populacji ptaków z różnymi agentami:
+    # stany są grupowane według sieci, a każda sieć liczy swoje stany jednym mnożeniem macierzy,
+    # więc koszt zależy od liczby różnych sieci, a nie od liczby ptaków
+
+    def __init__(self, policies):
+        self.policies = list(policies)
+        self.outputs = self.policies[0].fc2_bias.shape[-1]
+
+    def __call__(self, states, members=None):
+        # states (k, input_dim), members - numery sieci dla kolejnych stanów (domyślnie 0..k-1)
+        if members is None:
+            members = np.arange(len(states))
+        q_values = np.empty((len(states), self.outputs), dtype=np.float32)
+        networks, inverse = np.unique(members, return_inverse=True)
+        for group, member in enumerate(networks):
+            rows = np.flatnonzero(inverse == group)
+            q_values[rows] = self.policies[member](states[rows])
+        return q_values
@@ -0,0 +1,93 @@
+import numpy as np
+
+from flappy_env import FlappyEnv, Fish, PIPE_WIDTH, SPEED
+
+# gra wielu ptaków na tych samych rurach: każdy ptak może mieć innego agenta,
+# rury (handle_pipes) i najbliższa rura liczone są raz dla całej populacji,
+# martwe ptaki odpadają, a epizod trwa, dopóki żyje choć jeden
+
+
+class PopulationEnv(FlappyEnv):
+    def __init__(self, size, seed=None, pipe_collision=None, action_repeat=1):
+        self.size = size
+        self.fishes = []
+        self.alive = np.zeros(size, dtype=bool)
+        self.scores = np.zeros(size, dtype=np.int64)
+        super().__init__(seed, pipe_collision, action_repeat)
+
+    def reset(self):
+        # rozpoczęcie nowego epizodu, zwraca stany wszystkich ptaków (size, 4)
+        self.fishes = [Fish() for _ in range(self.size)]
+        self.alive[:] = True
+        self.scores[:] = 0
+        super().reset()
+        self.fish = self.fishes[0]
+        return self.get_state()
+
+    def living_fish(self):
+        return [fish for fish, alive in zip(self.fishes, self.alive) if alive]
+
+    def step(self, actions):
+        # actions - akcje wszystkich ptaków (akcje martwych są pomijane)
+        # zwraca (stany, nagrody, które ptaki zginęły w tym kroku), koniec epizodu to playing == False
+        alive = self.alive.copy()
+        rewards = self.frame(actions)
+        for _ in range(self.action_repeat - 1):
+            if not self.playing:
+                break
+            rewards += self.frame(np.zeros(self.size, dtype=np.int64))
+        return self.get_state(), rewards, alive & ~self.alive
+
+    def frame(self, actions):
+        start = self.profiler.time()
+        for fish, action, alive in zip(self.fishes, actions, self.alive):
+            if alive:
+                if action == 1:
+                    fish.jump()
+                fish.move()
+        self.handle_pipes()
+        self.profiler.add("physics", start)
+        start = self.profiler.time()
+        rewards = self.check_collision()
+        self.profiler.add("check_collision", start)
+        return rewards
+
+    def get_state(self):
+        # wszystkie ptaki mają to samo x, więc najbliższa rura jest wspólna
+        pipe = self.closest_pipe()
+        top, _ = pipe.get_borders()
+        states = np.empty((self.size, 4), dtype=np.float32)
+        states[:, 0] = [fish.y_position for fish in self.fishes]
+        states[:, 1] = [fish.velocity for fish in self.fishes]
+        states[:, 2] = (pipe.x_position - self.fish.x_position) / SPEED
+        states[:, 3] = top - states[:, 0]
+        return states
+
+    def check_collision(self):
+        # te same zasady co FlappyEnv.check_collision, osobno dla każdego żywego ptaka;
+        # pipe.passed ustawiamy dopiero po wszystkich ptakach, bo wszystkie mijają rurę w tej samej klatce
+        rewards = np.zeros(self.size)
+        passed = []
+        for i, fish in enumerate(self.fishes):
+            if not self.alive[i]:
+                continue
+            rewards[i] = 0.1
+            if fish.check_base_collision() or fish.check_roof_collision():
+                self.alive[i] = False
+                rewards[i] = -20
+                continue
+            for pipe in self.pipes:
+                if self.pipe_collision(fish, pipe):
+                    self.alive[i] = False
+                    rewards[i] = self.pipe_punishment(pipe, fish)
+                    break
+                if not pipe.passed and pipe.x_position + PIPE_WIDTH < fish.x_position:
+                    passed.append(pipe)
+                    self.scores[i] += 1
+                    rewards[i] = self.pipe_reward(pipe, fish, self.scores[i])
+                    break
+        for pipe in passed:
+            pipe.passed = True
+        self.playing = bool(self.alive.any())
+        self.score = int(self.scores.max())
+        return rewards
@@ -0,0 +1,53 @@
+import time
+
+# opcjonalne pomiary czasu poszczególnych faz treningu
+# użycie:  start = profiler.time(); ...; profiler.add("faza", start)
+# NULL_PROFILER ma te same metody, ale nic nie mierzy, więc kod nie musi sprawdzać, czy pomiary są włączone
+
+
+class Profiler:
+    def __init__(self):
+        self.totals = {}  # łączny czas faz w sekundach
+        self.counts = {}  # liczniki, np. kroków gry i kroków treningu
+        self.started = time.perf_counter()
+
+    def time(self):
+        return time.perf_counter()
+
+    def add(self, name, start):
+        self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def summary(self, steps_name="steps", updates_name="updates"):
+        # podsumowanie od ostatniego reset(): kroki/s, aktualizacje/s i ms na krok gry dla każdej fazy
+        elapsed = time.perf_counter() - self.started
+        steps = self.counts.get(steps_name, 0)
+        updates = self.counts.get(updates_name, 0)
+        phases = ", ".join(f"{name} {total * 1000 / max(steps, 1):.3f}"
+                           for name, total in sorted(self.totals.items(), key=lambda item: -item[1]))
+        return (f"Profile: {steps / elapsed:.0f} steps/s, {updates / elapsed:.0f} updates/s, "
+                f"ms/step: {phases}")
+
+    def reset(self):
+        self.totals.clear()
+        self.counts.clear()
+        self.started = time.perf_counter()
+
+
+class NullProfiler:
+    def time(self):
+        return 0.0
+
+    def add(self, name, start):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def reset(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
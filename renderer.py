@@ -0,0 +1,73 @@
+import pygame
+
+from assets import load_image
+from flappy_env import WINDOW_HEIGHT, WINDOW_WIDTH, BASE_HEIGHT, FISH_WIDTH, FISH_HEIGHT, PIPE_WIDTH, PIPE_HEIGHT
+
+# rysowanie gry w oknie pygame z jak najmniejszym narzutem:
+# - obrazki w formacie ekranu (convert/convert_alpha), więc blit nie przelicza pikseli w każdej klatce
+# - czcionka tworzona raz, napis z wynikiem renderowany tylko gdy wynik się zmieni
+# - na ekran wysyłane są tylko prostokąty, w których coś się zmieniło (stare i nowe miejsca ptaka, rur i napisu)
+
+SCORE_POSITION = (WINDOW_WIDTH - 150, 30)
+
+
+class Renderer:
+    def __init__(self, window):
+        # okno musi już istnieć, convert() potrzebuje formatu ekranu
+        self.window = window
+        self.background = load_image("background.png").convert()  # tło i podłoże są w pełni nieprzezroczyste
+        self.base = load_image("base.png").convert()
+        self.fish = load_image("flappy.png").convert_alpha()
+        self.bottom_pipe = load_image("pipe.png").convert_alpha()
+        self.upper_pipe = load_image("pipe.png", True).convert_alpha()
+        self.font = pygame.font.SysFont("Arial", 32)
+        self.score = None
+        self.score_text = None
+        self.previous_rects = None  # None - następna klatka rysowana jest w całości
+
+    def invalidate(self):
+        # wymuszenie pełnego odświeżenia okna w następnej klatce
+        self.previous_rects = None
+
+    def sprite_rects(self, env):
+        rects = [self.score_text.get_rect(topleft=SCORE_POSITION)]
+        for fish in env.living_fish():
+            rects.append(pygame.Rect(int(fish.x_position), int(fish.y_position), FISH_WIDTH, FISH_HEIGHT))
+        for pipe in env.pipes:
+            rects.append(pygame.Rect(int(pipe.x_position), int(pipe.upper_y_position), PIPE_WIDTH, PIPE_HEIGHT))
+            rects.append(pygame.Rect(int(pipe.x_position), int(pipe.bottom_y_position), PIPE_WIDTH, PIPE_HEIGHT))
+        return rects
+
+    def draw_scene(self, env):
+        self.window.blit(self.background, (0, 0))
+        for pipe in env.pipes:
+            self.window.blit(self.upper_pipe, (pipe.x_position, pipe.upper_y_position))
+            self.window.blit(self.bottom_pipe, (pipe.x_position, pipe.bottom_y_position))
+        self.window.blit(self.base, (0, WINDOW_HEIGHT - BASE_HEIGHT))
+        for fish in env.living_fish():
+            self.window.blit(self.fish, (fish.x_position, fish.y_position))
+        self.window.blit(self.score_text, SCORE_POSITION)
+
+    def draw(self, env):
+        if env.score != self.score:
+            self.score = env.score
+            self.score_text = self.font.render(f"Score: {self.score}", True, (255, 255, 255))
+        rects = self.sprite_rects(env)
+
+        if self.previous_rects is None:
+            self.draw_scene(env)
+            pygame.display.update()
+        else:
+            # stary i nowy prostokąt każdego obiektu łączymy w jeden, potem przerysowujemy całą scenę
+            # przyciętą do tych obszarów - blit poza obszarem przycięcia prawie nic nie kosztuje
+            screen = self.window.get_rect()
+            dirty = [rect.union(previous).clip(screen) for rect, previous in zip(rects, self.previous_rects)]
+            dirty += [rect.clip(screen) for rect in rects[len(self.previous_rects):]]
+            dirty += [rect.clip(screen) for rect in self.previous_rects[len(rects):]]
+            dirty = [rect for rect in dirty if rect.width and rect.height]
+            for rect in dirty:
+                self.window.set_clip(rect)
+                self.draw_scene(env)
+            self.window.set_clip(None)
+            pygame.display.update(dirty)
+        self.previous_rects = rects
@@ -0,0 +1,20 @@
+import numpy as np
+
+# niezależne strumienie liczb losowych z jednego seeda (np.random.SeedSequence)
+# seed może być liczbą, None (losowa entropia systemu) albo gotowym SeedSequence, np. od procesu nadrzędnego
+# strumienie z spawn nie nakładają się, więc procesy robocze nie dzielą żadnego ukrytego stanu
+
+
+def seed_sequence(seed):
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def spawn_seeds(seed, count):
+    return seed_sequence(seed).spawn(count)
+
+
+def int_seed(seed):
+    # liczba dla random.Random, torch.manual_seed i FlappyEnv
+    return int(seed_sequence(seed).generate_state(1, np.uint64)[0] >> np.uint64(1))
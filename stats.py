@@ -0,0 +1,71 @@
+import math
+
+# statystyki wyników liczone strumieniowo: każdy wynik dodawany w O(1), bez sortowania historii
+# wyniki są liczbami całkowitymi, więc histogram daje dokładną medianę i percentyle
+
+
+class ScoreStats:
+    def __init__(self):
+        self.histogram = {}  # wynik -> liczba gier
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # suma kwadratów odchyleń (algorytm Welforda)
+        self.min = None
+        self.max = None
+
+    def add(self, score):
+        self.histogram[score] = self.histogram.get(score, 0) + 1
+        self.count += 1
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (score - self.mean)
+        self.min = score if self.min is None else min(self.min, score)
+        self.max = score if self.max is None else max(self.max, score)
+
+    def merge(self, other):
+        # połączenie statystyk z innego procesu
+        if other.count == 0:
+            return
+        for score, count in other.histogram.items():
+            self.histogram[score] = self.histogram.get(score, 0) + count
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def std(self):
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+    def value_at(self, rank):
+        # wynik na pozycji rank (od 0) w posortowanej liście wszystkich wyników
+        seen = 0
+        for score in sorted(self.histogram):
+            seen += self.histogram[score]
+            if rank < seen:
+                return score
+        return self.max
+
+    def percentile(self, q):
+        # interpolacja liniowa jak w numpy.percentile, dla q=50 daje tę samą medianę co median() z flappy_bird
+        if self.count == 0:
+            return None
+        rank = q / 100 * (self.count - 1)
+        lower = self.value_at(math.floor(rank))
+        upper = self.value_at(math.ceil(rank))
+        return lower + (upper - lower) * (rank - math.floor(rank))
+
+    def median(self):
+        return self.percentile(50)
+
+    def summary(self, percentiles=(5, 25, 50, 75, 95, 99)):
+        return {
+            "episodes": self.count,
+            "mean": self.mean,
+            "std": self.std(),
+            "min": self.min,
+            "max": self.max,
+            "percentiles": {str(q): self.percentile(q) for q in percentiles},
+        }
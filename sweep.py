@@ -0,0 +1,159 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import Manager, get_context
+
+import torch
+
+from Agent_class import Agent
+from flappy_env import FlappyEnv
+from seeding import spawn_seeds, int_seed
+from training import AgentRunner
+
+# przeszukiwanie hiperparametrów agenta: siatka albo losowe próby,
+# uruchamiane równolegle w puli procesów z ograniczoną liczbą rdzeni;
+# słabe próby są przerywane (reguła mediany na rewards_per_20_games), wyniki trafiają do jednej tabeli CSV
+# uruchomienie: python sweep.py --random 16 --cores 32 --episodes 2000
+
+# domyślna przestrzeń przeszukiwania, wartości z Agent.__init__ są w każdej liście
+SEARCH_SPACE = {
+    "alpha": [0.00003, 0.0001, 0.0003, 0.001],
+    "gamma": [0.95, 0.99, 0.995],
+    "network_sync_rate": [250, 1000, 4000],
+    "replay_capacity": [20000, 100000, 500000],
+    "batch_size": [32, 64, 128],
+    "hidden_dim": [64, 128, 512],
+    "epsilon_decay": [0.999, 0.9995, 0.9999],
+    "epsilon_min": [0.001, 0.01],
+    "double": [False, True],
+    "dueling": [False, True],
+    "n_step": [1, 3],
+}
+
+
+def grid_trials(space):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_trials(space, count, seed):
+    rng = random.Random(seed)
+    return [{name: rng.choice(values) for name, values in space.items()} for _ in range(count)]
+
+
+def should_stop(trial_id, rewards_per_20_games, progress, grace_windows, min_trials=2):
+    # reguła mediany: próba jest przerywana, gdy jej średnia nagroda z dotychczasowych okien 20 gier
+    # jest niższa niż mediana średnich innych prób z tej samej liczby okien
+    windows = len(rewards_per_20_games)
+    if windows < grace_windows:
+        return False
+    others = [statistics.mean(history[:windows]) for other_id, history in progress.items()
+              if other_id != trial_id and len(history) >= windows]
+    if len(others) < min_trials:
+        return False
+    return statistics.mean(rewards_per_20_games) < statistics.median(others)
+
+
+def run_trial(trial_id, params, episodes, seed, progress, grace_windows, max_steps, threads):
+    # trening bez okna, ten sam przebieg co w Game (training.AgentRunner): wybór akcji, krok, bufor, trening
+    # seed - np.random.SeedSequence próby, osobne strumienie dla agenta i rur
+    torch.set_num_threads(threads)
+    agent_seed, env_seed = spawn_seeds(seed, 2)
+    start = time.time()
+    agent = Agent(4, 2, device="cpu", seed=agent_seed, **params)
+    env = FlappyEnv(int_seed(env_seed))
+    runner = AgentRunner(agent, env)
+    rewards_per_20_games = []
+    last_rewards = 0
+    stopped = False
+    steps = 0
+    episode = 0
+    for episode in range(1, episodes + 1):
+        env.reset()
+        done = False
+        for _ in range(max_steps):
+            _, _, reward, done = runner.step()
+            last_rewards += reward
+            steps += 1
+            if done:
+                break
+        runner.end_episode(done)
+
+        if episode % 20 == 0:
+            rewards_per_20_games.append(last_rewards / 20)
+            last_rewards = 0
+            progress[trial_id] = list(rewards_per_20_games)
+            if should_stop(trial_id, rewards_per_20_games, progress, grace_windows):
+                stopped = True
+                break
+
+    tail = rewards_per_20_games[-5:]
+    return {
+        "trial": trial_id,
+        **params,
+        "final_reward": statistics.mean(tail) if tail else None,
+        "best_reward": max(rewards_per_20_games) if rewards_per_20_games else None,
+        "episodes": episode,
+        "steps": steps,
+        "stopped_early": stopped,
+        "seconds": round(time.time() - start, 1),
+    }
+
+
+def run_sweep(trials, episodes=2000, cores=None, threads_per_trial=1, seed=0, grace_episodes=400, max_steps=20000,
+              output=None):
+    cores = cores or os.cpu_count() or 1
+    workers = max(1, cores // threads_per_trial)
+    output = output or "logs/sweep_" + datetime.now().strftime("%Y-%m-%d-%H-%M-%S") + ".csv"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    print(f"{len(trials)} trials on {workers} workers x {threads_per_trial} threads")
+
+    results = []
+    with Manager() as manager:
+        progress = manager.dict()  # trial -> rewards_per_20_games, współdzielone przez wszystkie próby
+        with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+            trial_seeds = spawn_seeds(seed, len(trials))
+            futures = [pool.submit(run_trial, trial_id, params, episodes, trial_seeds[trial_id], progress,
+                                   grace_episodes // 20, max_steps, threads_per_trial)
+                       for trial_id, params in enumerate(trials)]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(json.dumps(result))
+
+    results.sort(key=lambda result: float("inf") if result["final_reward"] is None else -result["final_reward"])
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+    print("Results saved to " + output)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep over Agent settings")
+    parser.add_argument("--grid", action="store_true", help="full grid over SEARCH_SPACE")
+    parser.add_argument("--random", type=int, default=16, help="number of random trials")
+    parser.add_argument("--space", default=None, help="JSON file with {parameter: [values]} to search instead")
+    parser.add_argument("--episodes", type=int, default=2000)
+    parser.add_argument("--cores", type=int, default=None)
+    parser.add_argument("--threads-per-trial", type=int, default=1)
+    parser.add_argument("--grace-episodes", type=int, default=400, help="no early stopping before this many games")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    space = SEARCH_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    trials = grid_trials(space) if args.grid else random_trials(space, args.random, args.seed)
+    run_sweep(trials, args.episodes, args.cores, args.threads_per_trial, args.seed, args.grace_episodes,
+              output=args.output)
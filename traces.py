@@ -0,0 +1,209 @@
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+from flappy_env import FlappyEnv, SPEED
+
+# zapis i odtwarzanie gier w zwartym formacie binarnym
+# plik: MAGIC, a po nim kolejne fragmenty, po jednym na grę (można dopisywać do istniejącego pliku):
+#   nagłówek HEADER: seed, liczba kroków, action_repeat, wynik, flagi
+#   akcje: uint8 * kroki
+#   tylko z flagą HAS_STATES: stany float32 * (kroki + 1) * 4 (z początkowym) i nagrody float32 * kroki
+# seed i akcje wystarczają, żeby odtworzyć grę - FlappyEnv z tym samym seedem ma ten sam układ rur
+# uruchomienie: python traces.py play traces/eval_bestAgent.trc --episode 0
+
+MAGIC = b"FLAPTRC1"
+HEADER = struct.Struct("<qIIiB")
+HAS_STATES = 1
+FINISHED = 2  # gra zakończona kolizją, a nie przerwana
+NO_SEED = -1  # gra bez znanego seeda, da się ją odczytać tylko z zapisanych stanów
+
+
+class Trace:
+    def __init__(self, seed, actions, action_repeat=1, score=0, finished=True, states=None, rewards=None):
+        self.seed = seed
+        self.actions = np.asarray(actions, dtype=np.uint8)
+        self.action_repeat = action_repeat
+        self.score = score
+        self.finished = finished
+        self.states = states  # (kroki + 1, 4) albo None
+        self.rewards = rewards  # (kroki,) albo None
+
+    def simulate(self, pipe_collision=None):
+        # ponowne rozegranie gry bez okna, zwraca kolejno (środowisko, stan, akcja, nowy stan, nagroda, koniec)
+        if self.seed == NO_SEED:
+            raise ValueError("trace has no seed and cannot be re-simulated")
+        env = FlappyEnv(self.seed, pipe_collision, self.action_repeat)
+        state = env.get_state()
+        for action in self.actions.tolist():
+            new_state, reward, done = env.step(action)
+            yield env, state, action, new_state, reward, done
+            state = new_state
+            if done:
+                break
+
+    def transitions(self):
+        # przejścia (stan, akcja, nowy stan, nagroda, koniec) do bufora pamięci,
+        # z symulacji gdy jest seed, w przeciwnym razie z zapisanych stanów
+        if self.seed != NO_SEED:
+            for _, state, action, new_state, reward, done in self.simulate():
+                yield state, action, new_state, reward, done
+            return
+        if self.states is None:
+            raise ValueError("trace has neither a seed nor recorded states")
+        last = len(self.actions) - 1
+        for i, action in enumerate(self.actions.tolist()):
+            yield self.states[i], action, self.states[i + 1], float(self.rewards[i]), self.finished and i == last
+
+
+class TraceWriter:
+    # states=True - oprócz akcji zapisuje stany i nagrody (ok. 20 razy więcej miejsca)
+    # append=False - zaczyna plik od nowa zamiast dopisywać gry na końcu
+    def __init__(self, path, states=False, append=True):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.states = states
+        self.file = open(path, "ab" if append else "wb")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write(self, trace):
+        has_states = self.states and trace.states is not None
+        flags = (HAS_STATES if has_states else 0) | (FINISHED if trace.finished else 0)
+        self.file.write(HEADER.pack(trace.seed, len(trace.actions), trace.action_repeat, trace.score, flags))
+        self.file.write(trace.actions.tobytes())
+        if has_states:
+            self.file.write(np.asarray(trace.states, dtype=np.float32).tobytes())
+            self.file.write(np.asarray(trace.rewards, dtype=np.float32).tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class TraceRecorder:
+    # zapis gry krok po kroku, np. w Game: start na początku gry, add po każdym kroku, finish na końcu
+    def __init__(self, writer):
+        self.writer = writer
+        self.seed = NO_SEED
+        self.actions = []
+        self.states = []
+        self.rewards = []
+
+    def start(self, seed, state):
+        self.seed = seed
+        self.actions = []
+        self.states = [state] if self.writer.states else []
+        self.rewards = []
+
+    def add(self, action, new_state, reward):
+        self.actions.append(action)
+        if self.writer.states:
+            self.states.append(new_state)
+            self.rewards.append(reward)
+
+    def finish(self, score, finished=True):
+        if not self.actions:
+            return
+        states = np.array(self.states, dtype=np.float32) if self.writer.states else None
+        rewards = np.array(self.rewards, dtype=np.float32) if self.writer.states else None
+        self.writer.write(Trace(self.seed, self.actions, 1, score, finished, states, rewards))
+        self.actions = []
+
+
+def read_traces(path):
+    # odczyt fragment po fragmencie, niedokończony ostatni fragment (np. po przerwaniu zapisu) jest pomijany
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a trace file")
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            seed, steps, action_repeat, score, flags = HEADER.unpack(header)
+            actions = f.read(steps)
+            states = rewards = None
+            if flags & HAS_STATES:
+                states = f.read((steps + 1) * 4 * 4)
+                rewards = f.read(steps * 4)
+                if len(states) < (steps + 1) * 4 * 4 or len(rewards) < steps * 4:
+                    return
+                states = np.frombuffer(states, dtype=np.float32).reshape(steps + 1, 4)
+                rewards = np.frombuffer(rewards, dtype=np.float32)
+            if len(actions) < steps:
+                return
+            yield Trace(seed, np.frombuffer(actions, dtype=np.uint8), action_repeat, score,
+                        bool(flags & FINISHED), states, rewards)
+
+
+def fill_replay_buffer(buffer, path):
+    # wypełnienie bufora pamięci przejściami z zapisanych gier (np. gier eksperta)
+    count = 0
+    for trace in read_traces(path):
+        for transition in trace.transitions():
+            buffer.push(transition)
+            count += 1
+        if not trace.finished:
+            buffer.end_episode()
+    return count
+
+
+def check(path):
+    # ponowna symulacja wszystkich gier z pliku z pełną szybkością, wyniki muszą się zgadzać z zapisanymi
+    start = time.time()
+    episodes = steps = mismatches = 0
+    for index, trace in enumerate(read_traces(path)):
+        if trace.seed == NO_SEED:
+            continue
+        env = None
+        for env, *_ in trace.simulate():
+            steps += 1
+        episodes += 1
+        if env is not None and env.score != trace.score:
+            mismatches += 1
+            print(f"Episode {index}: recorded score {trace.score}, re-simulated {env.score}")
+    elapsed = time.time() - start
+    print(f"{episodes} episodes, {steps} steps re-simulated in {elapsed:.2f}s "
+          f"({steps / max(elapsed, 1e-9):.0f} steps/s), {mismatches} mismatches")
+    return mismatches
+
+
+def play(path, episode=0, fps=30 * SPEED):
+    # odtworzenie gry w oknie, pygame wczytywany dopiero tutaj, bo reszta modułu działa bez niego
+    import pygame
+    from flappy_env import WINDOW_WIDTH, WINDOW_HEIGHT
+    from renderer import Renderer
+
+    trace = next(trace for index, trace in enumerate(read_traces(path)) if index == episode)
+    pygame.init()
+    window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    renderer = Renderer(window)
+    clock = pygame.time.Clock()
+    for env, *_ in trace.simulate():
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        renderer.draw(env)
+        clock.tick(fps)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect, re-simulate and play recorded episodes")
+    parser.add_argument("command", choices=["info", "check", "play"])
+    parser.add_argument("path")
+    parser.add_argument("--episode", type=int, default=0, help="episode index for play")
+    parser.add_argument("--fps", type=int, default=30 * SPEED)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        for index, trace in enumerate(read_traces(args.path)):
+            print(f"{index}: seed {trace.seed}, {len(trace.actions)} steps, action_repeat {trace.action_repeat}, "
+                  f"score {trace.score}{'' if trace.finished else ' (unfinished)'}"
+                  f"{', with states' if trace.states is not None else ''}")
+    elif args.command == "check":
+        check(args.path)
+    else:
+        play(args.path, args.episode, args.fps)
@@ -0,0 +1,54 @@
+from profiler import NULL_PROFILER
+
+# wspólny przebieg gry agenta dla Game (flappy_bird.py) i sweep.py, żeby oba miejsca uczyły agenta tak samo:
+# agent decyduje co action_repeat klatek (skok tylko w pierwszej z nich), nagrody z tych klatek trafiają
+# do bufora pamięci jako jedno przejście, a po każdym przejściu wykonywany jest Agent.train
+
+
+class AgentRunner:
+    # train=False - agent tylko gra (tryb test), bez zapisu do bufora i treningu
+    def __init__(self, agent, env, action_repeat=1, train=True):
+        self.agent = agent
+        self.env = env
+        self.action_repeat = action_repeat
+        self.train = train
+        self.profiler = NULL_PROFILER
+        self.start_episode()
+
+    def start_episode(self):
+        self.frames_left = 0  # klatki pozostałe do następnej decyzji agenta
+        self.block_reward = 0  # suma nagród od ostatniej decyzji agenta
+        self.state = None  # stan, w którym agent podjął ostatnią decyzję
+        self.action = None
+
+    def step(self):
+        # jedna klatka gry, zwraca (akcja wykonana w tej klatce, nowy stan, nagroda, koniec)
+        action = 0
+        if self.frames_left == 0:
+            self.state = self.env.get_state()
+            start = self.profiler.time()
+            self.action = self.agent.select_action(self.state)
+            self.profiler.add("select_action", start)
+            action = self.action
+            self.frames_left = self.action_repeat
+        self.frames_left -= 1
+
+        state, reward, done = self.env.step(action)
+        if self.train:
+            self.block_reward += reward
+            if self.frames_left == 0 or done:
+                start = self.profiler.time()
+                self.agent.replay_buffer.push((self.state, self.action, state, self.block_reward, done))
+                self.profiler.add("replay_push", start)
+                self.block_reward = 0
+                self.agent.train()
+        return action, state, reward, done
+
+    def end_episode(self, finished=True):
+        # finished=False - epizod przerwany bez kolizji (np. limit kroków),
+        # przejścia n-krokowe nie mogą wtedy sięgać do następnego epizodu
+        if self.train:
+            if not finished:
+                self.agent.replay_buffer.end_episode()
+            self.agent.update()
+        self.start_episode()
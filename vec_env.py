@@ -0,0 +1,168 @@
+import numpy as np
+
+from flappy_env import (WINDOW_HEIGHT, WINDOW_WIDTH, SPEED, JUMP, FISH_WIDTH, FISH_HEIGHT, PIPE_WIDTH, PIPE_HEIGHT,
+                        BASE_HEIGHT, FISH_SHAPE, UPPER_PIPE_SHAPE, BOTTOM_PIPE_SHAPE, Pipe)
+
+# wektorowa wersja FlappyEnv: n ptaków, każdy z własnymi rurami, wszystkie liczone naraz w NumPy
+# zasady gry są takie same jak w flappy_env (Fish.move, FlappyEnv.handle_pipes, check_collision)
+
+MAX_PIPES = 3  # na ekranie są jednocześnie co najwyżej 2 rury, jeden slot zapasu
+FISH_X = 50
+ACCELERATION = 2
+MAX_VELOCITY = 20
+PIPE_VELOCITY = 5 * SPEED
+
+_FISH_SHAPE = np.array(FISH_SHAPE)[:, None, :]  # (prostokąty ptaka, 1, 4)
+_UPPER_PIPE_SHAPE = np.array(UPPER_PIPE_SHAPE)[None, :, :]  # (1, prostokąty rury, 4)
+_BOTTOM_PIPE_SHAPE = np.array(BOTTOM_PIPE_SHAPE)[None, :, :]
+
+
+def shapes_overlap(pipe_shape, dx, dy):
+    # wektorowy odpowiednik flappy_env.shapes_overlap(FISH_SHAPE, pipe_shape, (dx, dy))
+    # dx, dy to tablice przesunięć o tym samym kształcie, wynik również
+    dx = dx[..., None, None]
+    dy = dy[..., None, None]
+    top = np.maximum(_FISH_SHAPE[..., 0], pipe_shape[..., 0] + dy)
+    bottom = np.minimum(_FISH_SHAPE[..., 1], pipe_shape[..., 1] + dy)
+    left = np.maximum(_FISH_SHAPE[..., 2], pipe_shape[..., 2] + dx)
+    right = np.minimum(_FISH_SHAPE[..., 3], pipe_shape[..., 3] + dx)
+    return ((top <= bottom) & (left <= right)).any(axis=(-2, -1))
+
+
+class VecFlappyEnv:
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.random = np.random.default_rng(seed)
+        self.rows = np.arange(n)
+
+        # ptaki
+        self.y_position = np.zeros(n)
+        self.velocity = np.zeros(n)
+        self.score = np.zeros(n, dtype=np.int64)
+
+        # kolejki rur, slot 0 to zawsze najstarsza rura (tak jak self.pipes[0] w FlappyEnv)
+        self.pipe_x = np.zeros((n, MAX_PIPES), dtype=np.int64)
+        self.pipe_upper_y = np.zeros((n, MAX_PIPES), dtype=np.int64)
+        self.pipe_passed = np.zeros((n, MAX_PIPES), dtype=bool)
+        self.pipe_active = np.zeros((n, MAX_PIPES), dtype=bool)
+
+        self.reset()
+
+    def random_pipes(self, count):
+        # położenia górnych rur, ten sam przedział co w Pipe.__init__
+        return self.random.integers(Pipe.UPPER_LIMIT - PIPE_HEIGHT, Pipe.BOTTOM_LIMIT - PIPE_HEIGHT,
+                                    size=count, endpoint=True)
+
+    def reset(self, mask=None):
+        # restart wybranych środowisk (domyślnie wszystkich), zwraca stany wszystkich ptaków
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        self.y_position[mask] = WINDOW_HEIGHT / 3
+        self.velocity[mask] = -JUMP
+        self.score[mask] = 0
+        self.pipe_active[mask] = False
+        self.pipe_passed[mask] = False
+        self.pipe_x[mask, 0] = WINDOW_WIDTH
+        self.pipe_upper_y[mask, 0] = self.random_pipes(np.count_nonzero(mask))
+        self.pipe_active[mask, 0] = True
+        return self.get_state()
+
+    def step(self, actions):
+        # krok wszystkich ptaków naraz, actions to tablica n akcji (1 - skok)
+        # zwraca (stany, nagrody, końce epizodów), stany zakończonych epizodów są stanami końcowymi,
+        # a same środowiska są od razu restartowane - nowy stan początkowy daje get_state()
+        actions = np.asarray(actions)
+        self.velocity = np.where(actions == 1, -JUMP, self.velocity)
+        self.y_position += self.velocity
+        self.velocity = np.minimum(self.velocity + ACCELERATION, MAX_VELOCITY)
+
+        self.handle_pipes()
+        rewards, dones = self.check_collision()
+        states = self.get_state()
+
+        if dones.any():
+            self.reset(dones)
+        return states, rewards, dones
+
+    def handle_pipes(self):
+        # dodawanie nowej rury, gdy ostatnia dojedzie do lewej krawędzi, ruch i usuwanie rur poza ekranem
+        count = self.pipe_active.sum(axis=1)
+        last_x = self.pipe_x[self.rows, count - 1]
+        spawn = last_x < 10
+        if spawn.any():
+            rows, slots = self.rows[spawn], count[spawn]
+            self.pipe_x[rows, slots] = WINDOW_WIDTH
+            self.pipe_upper_y[rows, slots] = self.random_pipes(len(rows))
+            self.pipe_passed[rows, slots] = False
+            self.pipe_active[rows, slots] = True
+
+        self.pipe_x[self.pipe_active] -= PIPE_VELOCITY
+
+        # tylko najstarsza rura może wyjechać poza ekran, usuwamy ją przesuwając kolejkę w lewo
+        remove = self.pipe_x[:, 0] + PIPE_WIDTH < 0
+        if remove.any():
+            for pipes in (self.pipe_x, self.pipe_upper_y, self.pipe_passed, self.pipe_active):
+                pipes[remove] = np.roll(pipes[remove], -1, axis=1)
+            self.pipe_active[remove, -1] = False
+
+    def check_collision(self):
+        # kolizje i nagrody dla wszystkich ptaków, zasady jak w FlappyEnv.check_collision:
+        # podłoże i sufit -20, pierwsza rura w kolejce z kolizją lub minięciem decyduje o nagrodzie,
+        # w przeciwnym razie 0.1
+        rewards = np.full(self.n, 0.1)
+        dones = np.zeros(self.n, dtype=bool)
+
+        # dokładne kolizje liczymy tylko dla rur, które w poziomie nachodzą na ptaka
+        dx = self.pipe_x - FISH_X
+        near = self.pipe_active & (dx + _BOTTOM_PIPE_SHAPE[..., 3].max() >= 0) & (dx < FISH_WIDTH)
+        hit = np.zeros_like(near)
+        rows, slots = np.nonzero(near)
+        if len(rows):
+            y = self.y_position[rows]
+            upper_y = self.pipe_upper_y[rows, slots]
+            bottom_y = upper_y + Pipe.GAP + PIPE_HEIGHT
+            hit[rows, slots] = (shapes_overlap(_UPPER_PIPE_SHAPE, dx[rows, slots], upper_y - y)
+                                | shapes_overlap(_BOTTOM_PIPE_SHAPE, dx[rows, slots], bottom_y - y))
+        passed = self.pipe_active & ~self.pipe_passed & (self.pipe_x + PIPE_WIDTH < FISH_X)
+
+        bounds = (self.y_position + FISH_HEIGHT >= WINDOW_HEIGHT - BASE_HEIGHT) | (self.y_position <= 0)
+        event = (hit | passed) & ~bounds[:, None]
+        has_event = event.any(axis=1)
+        first = event.argmax(axis=1)
+
+        rows = self.rows[has_event]
+        first = first[has_event]
+        first_hit = hit[rows, first]
+
+        # odległość środka ptaka od środka szczeliny pierwszej rury
+        f_y = self.y_position[rows] + FISH_HEIGHT / 2
+        p_x = self.pipe_x[rows, first] + PIPE_WIDTH
+        p_y = self.pipe_upper_y[rows, first] + PIPE_HEIGHT + Pipe.GAP / 2
+
+        hit_rows = rows[first_hit]
+        rewards[hit_rows] = -5 + -5 * np.sqrt((FISH_X - p_x[first_hit]) ** 2
+                                              + (f_y[first_hit] - p_y[first_hit]) ** 2) / WINDOW_HEIGHT
+        dones[hit_rows] = True
+
+        pass_rows = rows[~first_hit]
+        self.pipe_passed[pass_rows, first[~first_hit]] = True
+        self.score[pass_rows] += 1
+        center_offset = np.abs(f_y[~first_hit] - p_y[~first_hit]) / (WINDOW_HEIGHT / 2)
+        rewards[pass_rows] = 10 - 2 * center_offset + self.score[pass_rows]
+
+        rewards[bounds] = -20
+        dones[bounds] = True
+        return rewards, dones
+
+    def get_state(self):
+        # stany wszystkich ptaków jako tablica (n, 4), te same cechy co FlappyEnv.get_state
+        ahead = self.pipe_active & (self.pipe_x - FISH_X > -PIPE_WIDTH)
+        closest = np.where(ahead.any(axis=1), ahead.argmax(axis=1), 0)
+        pipe_x = self.pipe_x[self.rows, closest]
+        top = self.pipe_upper_y[self.rows, closest] + PIPE_HEIGHT
+        return np.stack([
+            self.y_position,
+            self.velocity,
+            (pipe_x - FISH_X) / SPEED,
+            top - self.y_position,
+        ], axis=1).astype(np.float32)